@@ -0,0 +1,291 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, unicode_literals
+
+import copy
+import hashlib
+import json
+import logging
+import threading
+import time
+
+from django.utils import six
+from django.utils.encoding import force_text
+
+from haystack.utils import get_model_ct
+
+from .utils import get_cache
+
+logger = logging.getLogger(__name__)
+
+GENERATION_KEY = "drf_haystack:generation:%s"
+RESULTS_KEY = "drf_haystack:results:%s"
+FLIGHT_LOCK_KEY = "drf_haystack:flight:lock:%s"
+FLIGHT_RESULTS_KEY = "drf_haystack:flight:results:%s"
+
+# Bumped whenever any indexed model changes.
+ALL_MODELS = "__all__"
+
+# Only bumped by calling `bump_generation()` without a model,
+# ie. after rebuilding the search indexes.
+GLOBAL = "__global__"
+
+
+def _initial_generation():
+    # If the generation counter is evicted from the cache, we start over
+    # from a new value rather than from 0, so entries cached with the
+    # old counter can never become valid again.
+    return int(time.time() * 1000)
+
+
+def get_generations(models=None, alias="default"):
+    """
+    Returns the current generation counters for `models`, or the counter
+    for all the indexed models if `models` is empty, along with the global
+    generation counter.
+    """
+    cache = get_cache(alias)
+    labels = [get_model_ct(model) for model in models] if models else [ALL_MODELS]
+    keys = [GENERATION_KEY % label for label in labels + [GLOBAL]]
+
+    generations = cache.get_many(keys)
+    for key in keys:
+        if key not in generations:
+            cache.add(key, _initial_generation(), None)
+            generations[key] = cache.get(key)
+    return [generations[key] for key in keys]
+
+
+def bump_generation(model=None, alias="default"):
+    """
+    Invalidates the cached search results for `model`, or all the cached
+    search results if `model` is ``None``.
+    """
+    cache = get_cache(alias)
+    labels = [get_model_ct(model), ALL_MODELS] if model is not None else [GLOBAL]
+    for label in labels:
+        key = GENERATION_KEY % label
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, _initial_generation(), None)
+
+
+def make_results_key(*parts):
+    """
+    Returns a cache key for the search results identified by `parts`.
+    """
+    data = json.dumps(parts, sort_keys=True, default=force_text)
+    return RESULTS_KEY % hashlib.md5(data.encode("utf-8")).hexdigest()
+
+
+def dump_queryset(queryset):
+    """
+    Returns a cache entry with the total number of results and the results
+    fetched so far by `queryset`, or ``None`` if it has not been evaluated.
+    The results are stored as ``(start, results)`` segments.
+    """
+    count = queryset.query._hit_count
+    if count is None:
+        return None
+
+    segments, start, results = [], None, []
+    for position, result in enumerate(queryset._result_cache):
+        if result is None:
+            if results:
+                segments.append((start, results))
+            start, results = None, []
+            continue
+
+        if start is None:
+            start = position
+        # Don't cache the model instances loaded by the serializer.
+        result = copy.copy(result)
+        result._object = None
+        results.append(result)
+    if results:
+        segments.append((start, results))
+
+    return {
+        "count": count,
+        "segments": segments,
+        "created": time.time(),
+    }
+
+
+def prime_queryset(queryset, entry):
+    """
+    Fills the result cache of `queryset` from a cache entry, so that
+    slicing or counting the results within the cached segments doesn't
+    make any requests to the search backend.
+    """
+    queryset._result_cache = [None] * entry["count"]
+    for start, results in entry["segments"]:
+        queryset._result_cache[start:start + len(results)] = results
+    queryset._result_count = entry["count"]
+    queryset.query._hit_count = entry["count"]
+    if None not in queryset._result_cache:
+        # Every result is cached, so the query doesn't need to run at all.
+        queryset.query._results = queryset._result_cache
+    return queryset
+
+
+def is_stale(entry, timeout):
+    """
+    Returns True if the cache `entry` is older than `timeout` seconds.
+    """
+    return timeout is not None and entry["created"] + timeout <= time.time()
+
+
+def count_cached_results(queryset):
+    """
+    Returns the number of results in the result cache of `queryset`.
+    """
+    return len(queryset._result_cache) - queryset._result_cache.count(None)
+
+
+class Flight(object):
+    """
+    A search request in progress, which concurrent identical requests wait for.
+    """
+
+    def __init__(self, key, alias=None):
+        self.key = key
+        self.alias = alias
+        self.entry = None
+        self.landed = False
+        self.event = threading.Event()
+
+
+class SingleFlight(object):
+    """
+    Coalesces concurrent identical search requests, so that only one of them
+    (the leader) queries the backend, and the others wait for its results.
+
+    Requests are coalesced across the threads of a process, and across
+    processes if a cache `alias` is given, by holding a lock in that cache
+    while querying the backend and publishing the results in it.
+    """
+
+    poll_interval = 0.05
+
+    def __init__(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, key, alias=None, timeout=5):
+        """
+        Returns a ``(flight, entry)`` tuple. If `flight` isn't ``None``, the
+        caller is the leader, which should query the backend and pass the
+        results to `land()`. Otherwise `entry` holds the results of the leader
+        (see `dump_queryset()`), or is ``None`` if the leader failed or didn't
+        finish within `timeout` seconds, in which case the caller should
+        query the backend itself.
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = Flight(key)
+
+        if not leader:
+            flight.event.wait(timeout)
+            return None, flight.entry
+
+        if alias is not None:
+            cache = get_cache(alias)
+            if not cache.add(FLIGHT_LOCK_KEY % key, 1, timeout):
+                # Another process is querying the backend, so wait for its
+                # results, and share them with the waiters in this process.
+                entry = self.wait(cache, key, timeout)
+                self.land(flight, entry)
+                return None, entry
+            flight.alias = alias
+        return flight, None
+
+    def wait(self, cache, key, timeout):
+        deadline = time.time() + timeout
+        while True:
+            entry = cache.get(FLIGHT_RESULTS_KEY % key)
+            if entry is not None or cache.get(FLIGHT_LOCK_KEY % key) is None or time.time() >= deadline:
+                return entry
+            time.sleep(self.poll_interval)
+
+    def land(self, flight, entry, timeout=5):
+        """
+        Publishes the results of a `flight` to the requests waiting for it.
+        """
+        if flight.landed:
+            return
+        if flight.alias is not None:
+            cache = get_cache(flight.alias)
+            if entry is not None:
+                cache.set(FLIGHT_RESULTS_KEY % flight.key, entry, timeout)
+            cache.delete(FLIGHT_LOCK_KEY % flight.key)
+
+        flight.entry = entry
+        flight.landed = True
+        with self._lock:
+            if self._flights.get(flight.key) is flight:
+                del self._flights[flight.key]
+        flight.event.set()
+
+
+# The flights of the search requests in this process.
+flights = SingleFlight()
+
+
+class RefreshPool(object):
+    """
+    A small pool of daemon threads, which refreshes stale cache entries in
+    the background. A refresh is only queued once per key at a time, and at
+    most `max_pending` refreshes are queued or running, so that the refreshes
+    can't overload the search backend. Further refreshes are dropped.
+    """
+
+    def __init__(self, workers=2, max_pending=100):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._queue = six.moves.queue.Queue()
+        self._pending = set()
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def submit(self, key, func):
+        """
+        Queues a call to `func` in order to refresh the entry for `key`.
+        Returns False if the refresh was dropped.
+        """
+        with self._lock:
+            if key in self._pending or len(self._pending) >= self.max_pending:
+                return False
+            self._pending.add(key)
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(target=self.work, name="drf-haystack-refresh")
+                thread.daemon = True
+                thread.start()
+                self._threads.append(thread)
+        self._queue.put((key, func))
+        return True
+
+    def work(self):
+        while True:
+            key, func = self._queue.get()
+            try:
+                func()
+            except Exception:
+                logger.exception("Failed to refresh the cache entry %s", key)
+            finally:
+                with self._lock:
+                    self._pending.discard(key)
+                self._queue.task_done()
+
+    def join(self):
+        """
+        Blocks until every queued refresh has finished.
+        """
+        self._queue.join()
+
+
+# The background refreshes of stale search results in this process.
+refreshes = RefreshPool()
@@ -2,6 +2,9 @@
 
 from __future__ import absolute_import, unicode_literals
 
+import copy
+import datetime
+import functools
 import operator
 import warnings
 from itertools import chain
@@ -9,12 +12,151 @@ from itertools import chain
 from django.conf import settings
 from django.core.exceptions import ImproperlyConfigured
 from django.utils import six
+from django.utils.dateparse import parse_date, parse_datetime
 
 import haystack
-from haystack.query import SearchQuerySet
+from haystack import connections
+from haystack.constants import DEFAULT_ALIAS, FILTER_SEPARATOR, VALID_FILTERS
+from haystack.fields import EdgeNgramField, NgramField
 
+from rest_framework.exceptions import ValidationError
 from rest_framework.filters import BaseFilterBackend
 
+from .query import HaystackQueryBuilder, is_contradiction, normalize_sq, prime_results  # noqa
+from .suggestions import split_words
+from .utils import LRUCache
+
+# Lookups accepted in query parameters. Older haystack
+# versions don't list all of them in `VALID_FILTERS`.
+VALID_LOOKUPS = frozenset(chain(VALID_FILTERS, ["exact", "content", "fuzzy", "endswith"]))
+
+
+def _coerce_boolean(value):
+    lowered = value.lower()
+    if lowered in ("true", "1", "yes", "on"):
+        return True
+    if lowered in ("false", "0", "no", "off"):
+        return False
+    raise ValueError("Invalid boolean value.")
+
+
+def _coerce_date(value):
+    parsed = parse_date(value)
+    if parsed is None:
+        raise ValueError("Invalid date value.")
+    return parsed
+
+
+def _coerce_datetime(value):
+    parsed = parse_datetime(value)
+    if parsed is None:
+        parsed = _coerce_date(value)
+        parsed = datetime.datetime(parsed.year, parsed.month, parsed.day)
+    return parsed
+
+
+class FilterSchema(object):
+    """
+    The filtering rules of a view, compiled from the ``Meta`` class of its
+    serializer into lookup tables, so query parameters can be parsed without
+    walking through the serializer ``Meta`` options for every parameter.
+    """
+
+    # Functions converting query parameter values to the type of the
+    # index field, by the `field_type` of the haystack field.
+    coercers = {
+        "integer": int,
+        "float": float,
+        "boolean": _coerce_boolean,
+        "date": _coerce_date,
+        "datetime": _coerce_datetime,
+    }
+
+    # Index fields of these types aren't analyzed, so multiple values for a
+    # lookup without a lookup type can be compacted into an `in` lookup.
+    exact_types = frozenset(["integer", "float", "date", "datetime"])
+
+    # Values of lookups which don't compare against the field value itself
+    # are passed on to the backend as is.
+    uncoerced_lookups = frozenset(["contains", "startswith", "endswith", "fuzzy", "content"])
+
+    # The maximum number of parsed parameter names kept per schema.
+    max_parsed_params = 1024
+
+    def __init__(self, serializer_class=None, negation_keyword="not", cache_size=0):
+        self.negation_keyword = negation_keyword
+        # Compiled SQ filters, by normalized query parameters.
+        self.cache = LRUCache(maxsize=cache_size) if cache_size else None
+        self.aliases = {}
+        self.allowed = None
+        self.exclude = frozenset()
+        self.field_coercers = {}
+        self.exact_fields = frozenset()
+        self._parsed = {}
+
+        if serializer_class is None:
+            return
+
+        try:
+            meta = serializer_class.Meta
+        except AttributeError:
+            raise ImproperlyConfigured("%s must implement a Meta class." % serializer_class.__name__)
+
+        self.aliases = dict(getattr(meta, "field_aliases", {}))
+        allowed = frozenset(chain(getattr(meta, "fields", []), getattr(meta, "search_fields", [])))
+        self.allowed = allowed or None
+        self.exclude = frozenset(getattr(meta, "exclude", []))
+
+        # Only coerce values for fields which have the same type in every index.
+        field_types = {}
+        for index_class in getattr(meta, "index_classes", []):
+            for field_name, field in index_class.fields.items():
+                field_types.setdefault(field_name, set()).add(field.field_type)
+        for field_name, types in field_types.items():
+            if len(types) == 1 and next(iter(types)) in self.coercers:
+                self.field_coercers[field_name] = self.coercers[next(iter(types))]
+        self.exact_fields = frozenset(
+            field_name for field_name, types in field_types.items() if len(types) == 1 and types <= self.exact_types
+        )
+
+    def parse(self, param):
+        """
+        Returns a ``(lookup, coercer, excluding)`` tuple for the query
+        parameter `param`, where ``lookup`` is the haystack lookup for the
+        parameter, with aliases resolved and the negation keyword removed,
+        ``coercer`` converts the parameter values to the type of the index
+        field or is ``None``, and ``excluding`` tells if the parameter is
+        negated. Returns ``None`` if the parameter should be ignored.
+        """
+        try:
+            return self._parsed[param]
+        except KeyError:
+            pass
+
+        parsed = self._parse(param)
+        if len(self._parsed) < self.max_parsed_params:
+            self._parsed[param] = parsed
+        return parsed
+
+    def _parse(self, param):
+        parts = param.split(FILTER_SEPARATOR)
+        base_param = self.aliases.get(parts[0], parts[0])
+
+        excluding = len(parts) > 1 and parts[1] == self.negation_keyword
+        lookups = parts[2:] if excluding else parts[1:]
+
+        if self.allowed is not None and base_param not in self.allowed:
+            return None
+        if base_param in self.exclude:
+            return None
+        if len(lookups) > 1 or (lookups and lookups[0] not in VALID_LOOKUPS):
+            return None
+
+        coercer = None
+        if not (lookups and lookups[0] in self.uncoerced_lookups):
+            coercer = self.field_coercers.get(base_param)
+        return FILTER_SEPARATOR.join([base_param] + lookups), coercer, excluding
+
 
 class HaystackFilter(BaseFilterBackend):
     """
@@ -22,8 +164,49 @@ class HaystackFilter(BaseFilterBackend):
     filtering query.
     """
 
-    @staticmethod
-    def build_filter(view, filters=None):
+    # Compiled filter schemas, by filter class, view class,
+    # serializer class and negation keyword.
+    _schemas = {}
+
+    # The number of compiled SQ filters cached per view class.
+    # Set to 0 in order to disable the cache.
+    filter_cache_size = 256
+
+    # Multiple values for an `exact` lookup are compacted into a single
+    # `in` lookup, which may hold at most `max_in_values` values.
+    compact_in_lookups = True
+    max_in_values = 1000
+
+    # The public methods applying the filter backend to a queryset, or
+    # providing its query parameters. If a subclass overrides any of them,
+    # the backend isn't applied through the query builder, but by
+    # `filter_queryset()`, which calls the overrides.
+    queryset_methods = ("filter_queryset", "get_request_filters")
+
+    @classmethod
+    def get_schema(cls, view):
+        """
+        Returns the compiled `FilterSchema` for `view`.
+        """
+        negation_keyword = getattr(settings, "DRF_HAYSTACK_NEGATION_KEYWORD", "not")
+        key = (cls, view.__class__, view.serializer_class, negation_keyword)
+        try:
+            return cls._schemas[key]
+        except KeyError:
+            schema = cls._schemas[key] = FilterSchema(
+                view.serializer_class, negation_keyword, cache_size=cls.filter_cache_size
+            )
+            return schema
+
+    @classmethod
+    def clear_schema_cache(cls):
+        """
+        Clears the compiled filter schemas, along with their cached filters.
+        """
+        HaystackFilter._schemas.clear()
+
+    @classmethod
+    def build_filter(cls, view, filters=None):
         """
         Creates a single SQ filter from querystring parameters that
         correspond to the SearchIndex fields that have been "registered"
@@ -33,70 +216,144 @@ class HaystackFilter(BaseFilterBackend):
         between parameters.
 
         Any querystring parameters that are not registered in
-        `view.fields` will be ignored.
+        `view.fields`, or which use an unknown lookup, will be ignored.
+        Values which can't be converted to the type of a numeric, boolean
+        or date index field raise a `ValidationError`.
+
+        Multiple values for an `exact` lookup, or for a numeric or date field
+        without a lookup, are queried with a single `in` lookup rather than
+        by `OR`-ing one term per value, unless
+        ``compact_in_lookups`` is False. A `ValidationError` is raised if
+        there are more than ``max_in_values`` values.
+
+        The filters are cached by the normalized parameters, so every
+        combination of parameters is only compiled once. A copy of the
+        cached filters is returned, as the ``SearchQuerySet`` may modify them.
         """
 
-        terms = []
-        exclude_terms = []
-
-        if filters is None:
-            filters = {}  # pragma: no cover
+        if not filters:
+            return [], []
 
+        schema = cls.get_schema(view)
+        clauses = []
         for param, value in filters.items():
-            # Skip if the parameter is not listed in the serializer's `fields`
-            # or if it's in the `exclude` list.
-            excluding_term = False
-            param_parts = param.split("__")
-            base_param = param_parts[0]  # only test against field without lookup
-            negation_keyword = getattr(settings, "DRF_HAYSTACK_NEGATION_KEYWORD", "not")
-            if len(param_parts) > 1 and param_parts[1] == negation_keyword:
-                excluding_term = True
-                param = param.replace("__%s" % negation_keyword, "")  # haystack wouldn't understand our negation
-
-            if view.serializer_class:
-                try:
-                    if hasattr(view.serializer_class.Meta, "field_aliases"):
-                        old_base = base_param
-                        base_param = view.serializer_class.Meta.field_aliases.get(base_param, base_param)
-                        param = param.replace(old_base, base_param)  # need to replace the alias
-
-                    fields = getattr(view.serializer_class.Meta, "fields", [])
-                    exclude = getattr(view.serializer_class.Meta, "exclude", [])
-                    search_fields = getattr(view.serializer_class.Meta, "search_fields", [])
-
-                    if ((fields or search_fields) and base_param not in chain(fields, search_fields)) or base_param in exclude or not value:
-                        continue
-
-                except AttributeError:
-                    raise ImproperlyConfigured("%s must implement a Meta class." %
-                                               view.serializer_class.__class__.__name__)
+            if not value:
+                continue
+            parsed = schema.parse(param)
+            if parsed is None:
+                continue
 
+            lookup, coercer, excluding_term = parsed
             tokens = [token.strip() for token in value.split(view.lookup_sep)]
-            field_queries = []
-
-            for token in tokens:
-                if token:
-                    field_queries.append(view.query_object((param, token)))
+            tokens = [token for token in tokens if token]
+            if not tokens:
+                continue
+            if coercer is not None:
+                try:
+                    tokens = [coercer(token) for token in tokens]
+                except (TypeError, ValueError):
+                    raise ValidationError({param: ["Invalid value \"%s\"." % value]})
+
+            tokens = tuple(sorted(set(tokens)))
+            if cls.compact_in_lookups and len(tokens) > 1 and lookup in schema.exact_fields:
+                lookup = FILTER_SEPARATOR.join((lookup, "exact"))
+            if cls.max_in_values is not None and len(tokens) > cls.max_in_values and cls.get_in_lookup(lookup, tokens):
+                raise ValidationError({param: ["Ensure there are no more than %d values." % cls.max_in_values]})
+            clauses.append((lookup, excluding_term, tokens))
+
+        if not clauses:
+            return [], []
+
+        clauses.sort()
+        if schema.cache is None:
+            return cls.compile_clauses(view, clauses)
+
+        key = (view.query_object, tuple(clauses))
+        compiled = schema.cache.get(key)
+        if compiled is None:
+            compiled = cls.compile_clauses(view, clauses)
+            schema.cache.set(key, compiled)
+        return copy.deepcopy(compiled)
+
+    @classmethod
+    def get_in_lookup(cls, lookup, tokens):
+        """
+        Returns the `in` lookup which should be used to query the `tokens`
+        of an `exact` or `in` lookup, or ``None``.
+        """
+        if not cls.compact_in_lookups:
+            return None
+        field_name, separator, lookup_type = lookup.rpartition(FILTER_SEPARATOR)
+        if separator and (lookup_type == "in" or (lookup_type == "exact" and len(tokens) > 1)):
+            return FILTER_SEPARATOR.join((field_name, "in"))
+        return None
+
+    @classmethod
+    def compile_clauses(cls, view, clauses):
+        """
+        Returns the ``(terms, exclude_terms)`` SQ filters for a list of
+        ``(lookup, excluding, tokens)`` clauses, `OR`-ing the tokens of a
+        clause and `AND`-ing the clauses.
+        """
+        terms = []
+        exclude_terms = []
 
-            term = six.moves.reduce(operator.or_, filter(lambda x: x, field_queries))
+        for lookup, excluding_term, tokens in clauses:
+            in_lookup = cls.get_in_lookup(lookup, tokens)
+            if in_lookup:
+                term = view.query_object((in_lookup, list(tokens)))
+            else:
+                term = six.moves.reduce(operator.or_, [view.query_object((lookup, token)) for token in tokens])
             if excluding_term:
                 exclude_terms.append(term)
             else:
                 terms.append(term)
 
-        terms = six.moves.reduce(operator.and_, filter(lambda x: x, terms)) if terms else []
-        exclude_terms = six.moves.reduce(operator.and_, filter(lambda x: x, exclude_terms)) if exclude_terms else []
+        terms = six.moves.reduce(operator.and_, terms) if terms else []
+        exclude_terms = six.moves.reduce(operator.and_, exclude_terms) if exclude_terms else []
         return (terms, exclude_terms)
 
+    @classmethod
+    def uses_query_builder(cls):
+        """
+        Returns True if the filter backend may contribute to a shared
+        `HaystackQueryBuilder` by `build_query()`, which isn't the case for
+        backends overriding any of the ``queryset_methods``.
+        """
+        for name in cls.queryset_methods:
+            owner = next(klass for klass in cls.__mro__ if name in vars(klass))
+            if owner.__module__ != HaystackFilter.__module__:
+                return False
+        return True
+
     def filter_queryset(self, request, queryset, view):
-        applicable_filters, applicable_exclusions = self.build_filter(view, filters=self.get_request_filters(request))
+        builder = HaystackQueryBuilder(queryset, self.get_request_filters(request))
+        self.build_query(request, builder, view)
+        return builder.apply()
+
+    def build_query(self, request, builder, view):
+        """
+        Adds the filters for the request to the `HaystackQueryBuilder`,
+        from the query parameters it shares with the other backends.
+        """
+        applicable_filters, applicable_exclusions = self.build_filter(view, filters=builder.params)
+        self.add_filters(builder, applicable_filters, applicable_exclusions)
+
+    def add_filters(self, builder, applicable_filters, applicable_exclusions):
+        """
+        Adds the SQ filters to the `builder`, which normalizes them and
+        checks them for contradictions before applying them.
+        """
         if applicable_filters:
-            queryset = queryset.filter(applicable_filters)
+            builder.add_filter(applicable_filters)
         if applicable_exclusions:
-            queryset = queryset.exclude(applicable_exclusions)
-        return queryset
+            builder.add_exclusion(applicable_exclusions)
 
     def get_request_filters(self, request):
+        """
+        Returns a mutable copy of the query parameters, which `filter_queryset()`
+        filters by when the backend is applied on its own.
+        """
         return request.GET.copy()
 
 
@@ -106,23 +363,162 @@ class HaystackAutocompleteFilter(HaystackFilter):
 
     Must be run against fields that are either `NgramField` or
     `EdgeNgramField`.
+
+    If the view has a `suggestion_index` holding the documents of its
+    `index_models`, queries on the indexed field alone are answered from the
+    `drf_haystack.suggestions.SuggestionIndex`.
+
+    Set `prefix_cache` to an `LRUCache` with a short timeout in order to
+    remember the results of queries with at most `prefix_cache_max_results`
+    results. Queries extending the words of a remembered query, as when
+    the user keeps typing, are then answered by filtering its results.
+    Only queries on a stored `EdgeNgramField` or `NgramField` with words of
+    `prefix_cache_min_gram` to `prefix_cache_max_gram` characters (the
+    ngram lengths of the haystack Elasticsearch backend) are cached, as the
+    backend doesn't match other queries the same way.
     """
 
-    def filter_queryset(self, request, queryset, view):
+    # `_construct_query()` splits the value of every term into words.
+    compact_in_lookups = False
+
+    prefix_cache = None
+    prefix_cache_max_results = 50
+    prefix_cache_min_gram = 2
+    prefix_cache_max_gram = 15
+
+    def build_query(self, request, builder, view):
         """
-        Applying `applicable_filters` to the queryset by creating a
+        Adding `applicable_filters` to the query by creating a
         single SQ filter using `AND`.
         """
 
-        applicable_filters, applicable_exclusions = self.build_filter(view, filters=self.get_request_filters(request))
+        filters = builder.params
+        applicable_filters, applicable_exclusions = self.build_filter(view, filters=filters)
 
         if applicable_filters:
-            queryset = queryset.filter(self._construct_query(applicable_filters, queryset, view))
+            applicable_filters = self._construct_query(applicable_filters, builder.queryset, view)
         if applicable_exclusions:
-            queryset = queryset.exclude(self._construct_query(applicable_exclusions, queryset, view))
+            applicable_exclusions = self._construct_query(applicable_exclusions, builder.queryset, view)
+
+        self.add_filters(builder, applicable_filters, applicable_exclusions)
+
+        if not applicable_filters or applicable_exclusions:
+            return
+        autocomplete_query = self.get_autocomplete_query(view, filters)
+        if autocomplete_query is None:
+            return
+
+        field, query = autocomplete_query
+        suggestion_index = getattr(view, "suggestion_index", None)
+        if suggestion_index is not None and suggestion_index.field == field \
+                and suggestion_index.holds_models(view.index_models) and suggestion_index.is_searchable(query):
+            builder.set_resolver(
+                applicable_filters, functools.partial(self.resolve_suggestions, suggestion_index, query)
+            )
+        elif self.prefix_cache is not None:
+            words = tuple(split_words(query))
+            field_class = self.get_ngram_field_class(view, field)
+            if words and field_class is not None \
+                    and all(self.prefix_cache_min_gram <= len(word) <= self.prefix_cache_max_gram for word in words):
+                edge = issubclass(field_class, EdgeNgramField)
+                builder.set_resolver(
+                    applicable_filters, functools.partial(self.resolve_prefix, view, field, words, edge)
+                )
+
+    def get_autocomplete_query(self, view, filters):
+        """
+        Returns a ``(field, query)`` tuple if the only filter is a single
+        value for a field, without a lookup, or ``None``.
+        """
+        schema = self.get_schema(view)
+        autocomplete_query = None
+        for param, value in filters.items():
+            parsed = schema.parse(param) if value else None
+            if parsed is None:
+                continue
+            lookup, _, excluding_term = parsed
+            if autocomplete_query is not None or excluding_term or FILTER_SEPARATOR in lookup \
+                    or view.lookup_sep in value:
+                return None
+            autocomplete_query = (lookup, value)
+        return autocomplete_query
 
+    @staticmethod
+    def get_ngram_field_class(view, field):
+        """
+        Returns the `EdgeNgramField` or `NgramField` class of the index
+        `field` of the view's models, or ``None`` unless it's the same stored
+        ngram field in every index, as the cached results are filtered by
+        their stored values.
+        """
+        unified_index = connections[DEFAULT_ALIAS].get_unified_index()
+        field_classes = set()
+        for model in view.index_models or unified_index.get_indexed_models():
+            index_field = unified_index.get_index(model).fields.get(field)
+            if not isinstance(index_field, NgramField) or not index_field.stored:
+                return None
+            field_classes.add(EdgeNgramField if isinstance(index_field, EdgeNgramField) else NgramField)
+        return field_classes.pop() if len(field_classes) == 1 else None
+
+    @staticmethod
+    def resolve_suggestions(suggestion_index, query, queryset):
+        return prime_results(queryset, suggestion_index.search(query))
+
+    def resolve_prefix(self, view, field, words, edge, queryset):
+        """
+        Primes `queryset` with the results of a remembered query for a
+        prefix of `words`, or fetches the results from the backend and
+        remembers them if there are at most ``prefix_cache_max_results``.
+        Remembered queries without results only answer the same query.
+        """
+        cache = self.prefix_cache
+        view_name = "%s.%s" % (view.__class__.__module__, view.__class__.__name__)
+
+        for prefix in self.get_prefix_candidates(words):
+            results = cache.get((view_name, field, prefix), record=False)
+            if results is not None and (results or prefix == words):
+                cache.record(True)
+                results = [result for result in results if self.matches_words(result, field, words, edge)]
+                if prefix != words:
+                    cache.set((view_name, field, words), results)
+                return prime_results(queryset, [copy.copy(result) for result in results])
+
+        cache.record(False)
+        results = list(queryset[:self.prefix_cache_max_results])
+        if queryset.count() <= self.prefix_cache_max_results:
+            cached = [copy.copy(result) for result in results]
+            for result in cached:
+                # Don't keep the model instances loaded by the serializers.
+                result._object = None
+            cache.set((view_name, field, words), cached)
+            return prime_results(queryset, results)
         return queryset
 
+    @staticmethod
+    def get_prefix_candidates(words):
+        """
+        Yields `words` along with the queries it extends, from the longest:
+        the last word shortened one character at a time, then without it.
+        """
+        yield words
+        last = words[-1]
+        for length in range(len(last) - 1, 0, -1):
+            yield words[:-1] + (last[:length],)
+        if len(words) > 1:
+            for prefix in HaystackAutocompleteFilter.get_prefix_candidates(words[:-1]):
+                yield prefix
+
+    @staticmethod
+    def matches_words(result, field, words, edge=True):
+        """
+        Returns True if every word in `words` starts (or, unless `edge` is
+        True, is part of) a word of the `field` of `result`.
+        """
+        result_words = split_words(getattr(result, field, None) or "")
+        if edge:
+            return all(any(result_word.startswith(word) for result_word in result_words) for word in words)
+        return all(any(word in result_word for result_word in result_words) for word in words)
+
     def _construct_query(self, terms, queryset, view):
         query_bits = []
         for field_name, query in terms.children:
@@ -145,6 +541,8 @@ class HaystackGEOSpatialFilter(HaystackFilter):
     (radius) filter.
     """
 
+    queryset_methods = HaystackFilter.queryset_methods + ("geo_filter",)
+
     def __init__(self, *args, **kwargs):
         try:
             from haystack.utils.geo import D, Point
@@ -168,7 +566,18 @@ class HaystackGEOSpatialFilter(HaystackFilter):
     def geo_filter(self, queryset, filters=None):
         """
         Filter the queryset by looking up parameters from the query
-        parameters.
+        parameters. See `get_geo_query()`.
+        """
+        geo_query = self.get_geo_query(queryset, filters)
+        if geo_query is not None:
+            point, distance = geo_query
+            queryset = queryset.dwithin("coordinates", point, distance).distance("coordinates", point)
+        return queryset
+
+    def get_geo_query(self, queryset, filters):
+        """
+        Returns a ``(point, distance)`` tuple from the query parameters,
+        or ``None`` if the parameters don't make up a geospatial query.
 
         Expected query parameters are:
         - a `unit=value` parameter where the unit is a valid UNIT in the
@@ -195,17 +604,27 @@ class HaystackGEOSpatialFilter(HaystackFilter):
                         distance = self.unit_to_meters(self.D(**distance))  # pragma: no cover
                     else:
                         distance = self.D(**distance)
-                    queryset = queryset.dwithin("coordinates", point, distance).distance("coordinates", point)
+                    return point, distance
             except ValueError:
                 raise ValueError("Cannot convert `from=latitude,longitude` query parameter to "
                                  "float values. Make sure to provide numerical values only!")
 
-        return queryset
+        return None
 
     def filter_queryset(self, request, queryset, view):
-        queryset = self.geo_filter(queryset, filters=request.GET.copy())
+        if not self.uses_query_builder():
+            queryset = self.geo_filter(queryset, filters=request.GET.copy())
         return super(HaystackGEOSpatialFilter, self).filter_queryset(request, queryset, view)
 
+    def build_query(self, request, builder, view):
+        # When `geo_filter()` is overridden, it's applied by `filter_queryset()`.
+        geo_query = self.get_geo_query(builder.queryset, builder.params) if self.uses_query_builder() else None
+        if geo_query is not None:
+            point, distance = geo_query
+            builder.add_dwithin("coordinates", point, distance)
+            builder.add_distance("coordinates", point)
+        super(HaystackGEOSpatialFilter, self).build_query(request, builder, view)
+
 
 class HaystackHighlightFilter(HaystackFilter):
     """
@@ -218,11 +637,10 @@ class HaystackHighlightFilter(HaystackFilter):
     highlighted words in an `<em>highlighted results</em>` block.
     """
 
-    def filter_queryset(self, request, queryset, view):
-        queryset = super(HaystackHighlightFilter, self).filter_queryset(request, queryset, view)
-        if request.GET and isinstance(queryset, SearchQuerySet):
-            queryset = queryset.highlight()
-        return queryset
+    def build_query(self, request, builder, view):
+        super(HaystackHighlightFilter, self).build_query(request, builder, view)
+        if builder.params:
+            builder.add_highlight()
 
 
 class HaystackBoostFilter(HaystackFilter):
@@ -239,17 +657,39 @@ class HaystackBoostFilter(HaystackFilter):
     The boost is applied *after* regular filtering has occurred.
     """
 
+    queryset_methods = HaystackFilter.queryset_methods + ("apply_boost",)
+
+    @classmethod
+    def apply_boost(cls, queryset, filters):
+        boost = cls.get_boost(filters)
+        if boost is not None:
+            queryset = queryset.boost(*boost)
+        return queryset
+
     @staticmethod
-    def apply_boost(queryset, filters):
+    def get_boost(filters):
+        """
+        Returns a ``(term, boost)`` tuple from the ``boost`` query
+        parameter, or ``None``.
+        """
         if "boost" in filters and len(filters["boost"].split(",")) == 2:
             term, boost = iter(filters["boost"].split(","))
             try:
-                queryset = queryset.boost(term, float(boost))
+                return term, float(boost)
             except ValueError:
                 raise ValueError("Cannot convert boost to float value. Make sure to provide a "
                                  "numerical boost value.")
-        return queryset
+        return None
 
     def filter_queryset(self, request, queryset, view):
         queryset = super(HaystackBoostFilter, self).filter_queryset(request, queryset, view)
-        return self.apply_boost(queryset, filters=request.GET.copy())
+        if not self.uses_query_builder():
+            queryset = self.apply_boost(queryset, filters=request.GET.copy())
+        return queryset
+
+    def build_query(self, request, builder, view):
+        super(HaystackBoostFilter, self).build_query(request, builder, view)
+        # When `apply_boost()` is overridden, it's applied by `filter_queryset()`.
+        boost = self.get_boost(builder.params) if self.uses_query_builder() else None
+        if boost is not None:
+            builder.add_boost(*boost)
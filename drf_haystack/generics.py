@@ -2,16 +2,24 @@
 
 from __future__ import absolute_import, unicode_literals
 
+import copy
+import time
 import warnings
 
 from django.http import Http404
 
 from haystack.backends import SQ
-from haystack.query import SearchQuerySet
+from haystack.query import EmptySearchQuerySet, SearchQuerySet
+from haystack.utils import get_model_ct
 from rest_framework.generics import GenericAPIView
 from rest_framework.permissions import AllowAny
 
+from .cache import (
+    count_cached_results, dump_queryset, flights, get_generations, is_stale, make_results_key, prime_queryset, refreshes
+)
 from .filters import HaystackFilter
+from .query import HaystackQueryBuilder
+from .utils import get_cache
 
 
 class HaystackGenericAPIView(GenericAPIView):
@@ -31,6 +39,38 @@ class HaystackGenericAPIView(GenericAPIView):
     document_uid_field = "id"
     lookup_sep = ","
 
+    # Set `result_cache_timeout` to a number of seconds in order to cache
+    # the search results (hits and total) of GET requests in the
+    # `result_cache_alias` Django cache. See `drf_haystack.cache`.
+    result_cache_timeout = None
+    result_cache_alias = "default"
+
+    # Set `result_cache_stale_timeout` to a number of seconds lower than
+    # `result_cache_timeout` in order to serve older cached results while
+    # they are refreshed in the background (see `drf_haystack.cache.refreshes`).
+    result_cache_stale_timeout = None
+
+    # Set `negative_result_cache` to a `drf_haystack.utils.LRUCache` with a
+    # short timeout in order to remember the GET requests without any results,
+    # and answer them without querying the backend. The entries are keyed by
+    # `get_result_cache_key()`, so they are invalidated along with the result
+    # cache when the index models change.
+    negative_result_cache = None
+
+    # Set `single_flight` to True in order to let concurrent identical GET
+    # requests share the results of a single search. The requests wait for
+    # at most `single_flight_timeout` seconds before searching themselves.
+    # Set `single_flight_alias` to a Django cache alias in order to share
+    # the results across processes too. See `drf_haystack.cache.SingleFlight`.
+    single_flight = False
+    single_flight_timeout = 5
+    single_flight_alias = None
+
+    # Set `suggestion_index` to a `drf_haystack.suggestions.SuggestionIndex`
+    # in order to answer autocomplete queries from memory.
+    # See `drf_haystack.filters.HaystackAutocompleteFilter`.
+    suggestion_index = None
+
     #
     # REST Framework overrides
     #
@@ -46,7 +86,7 @@ class HaystackGenericAPIView(GenericAPIView):
         if self.queryset and isinstance(self.queryset, self.object_class):
             queryset = self.queryset.all()
         else:
-            queryset = self.object_class()._clone()
+            queryset = self.object_class()
             if len(self.index_models):
                 queryset = queryset.models(*self.index_models)
         return queryset
@@ -73,6 +113,188 @@ class HaystackGenericAPIView(GenericAPIView):
 
         raise Http404("No result matches the given query.")
 
+    def filter_queryset(self, queryset):
+        """
+        Filters the queryset with every filter backend. Consecutive haystack
+        filter backends share one `HaystackQueryBuilder`, so the queryset is
+        only cloned once for all of them.
+        """
+        builder = None
+        for backend in list(self.filter_backends):
+            if getattr(backend, "uses_query_builder", None) and backend.uses_query_builder():
+                if builder is None:
+                    builder = HaystackQueryBuilder(queryset, self.request.GET)
+                backend().build_query(self.request, builder, self)
+                continue
+
+            if builder is not None:
+                queryset, builder = builder.apply(), None
+            queryset = backend().filter_queryset(self.request, queryset, self)
+        if builder is not None:
+            queryset = builder.apply()
+
+        if self.request.method not in ("GET", "HEAD") or not isinstance(queryset, SearchQuerySet) \
+                or isinstance(queryset, EmptySearchQuerySet):
+            return queryset
+        if getattr(self, "_refreshing", False):
+            return queryset
+        if self.negative_result_cache is None and self.result_cache_timeout is None \
+                and not self.uses_single_flight():
+            return queryset
+        # The key depends on the generation counters, which are fetched from
+        # the cache, so it is only computed once per request.
+        key = self.get_result_cache_key()
+        if self.negative_result_cache is not None and self.negative_result_cache.get(key):
+            return queryset.none()
+        if self.result_cache_timeout is not None:
+            queryset = self.get_cached_queryset(queryset, key)
+        if isinstance(queryset, EmptySearchQuerySet):
+            return queryset
+        if self.uses_single_flight() and queryset.query._hit_count is None:
+            queryset = self.get_single_flight_queryset(queryset, key)
+        if self.negative_result_cache is not None:
+            self._negative_cache_state = (key, queryset)
+        return queryset
+
+    def get_result_cache_key(self):
+        """
+        Returns the key for caching the search results of the current request.
+
+        The key is made from the view class and action, the index models, the
+        URL keyword arguments and the query parameters, along with the
+        generation counters of the index models, which are bumped when the
+        models change (see
+        `drf_haystack.signals.RealtimeGenerationSignalProcessor`). Override
+        this method if your filters depend on anything else, such as the user.
+        """
+        params = sorted((key, values) for key, values in self.request.GET.lists() if any(values))
+        return make_results_key(
+            "%s.%s" % (self.__class__.__module__, self.__class__.__name__),
+            getattr(self, "action", None),
+            sorted(get_model_ct(model) for model in self.index_models),
+            get_generations(self.index_models, self.result_cache_alias),
+            sorted(self.kwargs.items()),
+            params
+        )
+
+    def get_cached_queryset(self, queryset, key=None):
+        """
+        Primes `queryset` with the cached search results for the current
+        request, and remembers it in order to cache the results fetched while
+        handling the request in `finalize_response()`. Results older than
+        `result_cache_stale_timeout` are served, and refreshed in the background.
+        `key` defaults to the `get_result_cache_key()` of the request.
+        """
+        if key is None:
+            key = self.get_result_cache_key()
+        entry = get_cache(self.result_cache_alias).get(key)
+        if entry is not None:
+            stale = is_stale(entry, self.result_cache_stale_timeout)
+            if stale:
+                self.revalidate_cached_results(key, entry)
+            if not entry["count"]:
+                return queryset.none()
+            queryset = prime_queryset(queryset, entry)
+            if stale:
+                # Don't store the stale results again as fresh ones.
+                return queryset
+        self._result_cache_state = (key, queryset, count_cached_results(queryset))
+        return queryset
+
+    def revalidate_cached_results(self, key, entry):
+        """
+        Queues a background refresh of the stale cache `entry`, which runs a
+        copy of this view through `filter_queryset()` without the result cache
+        and fetches the same results again.
+        """
+        view = copy.copy(self)
+        view._refreshing = True
+        return refreshes.submit(key, lambda: view.refresh_cached_results(key, entry))
+
+    def refresh_cached_results(self, key, entry):
+        queryset = self.filter_queryset(self.get_queryset())
+        if isinstance(queryset, EmptySearchQuerySet):
+            entry = {"count": 0, "segments": [], "created": time.time()}
+        else:
+            for start, results in entry["segments"]:
+                list(queryset[start:start + len(results)])
+            if queryset.query._hit_count is None:
+                queryset.count()
+            entry = dump_queryset(queryset)
+        get_cache(self.result_cache_alias).set(key, entry, self.result_cache_timeout)
+
+    def uses_single_flight(self):
+        """
+        Only list requests are coalesced, as the results of other requests,
+        or of streamed responses, aren't fetched through the filtered queryset
+        before the response is finalized.
+        """
+        return self.single_flight and getattr(self, "action", "list") == "list" \
+            and not getattr(self, "streaming_list", False)
+
+    def get_single_flight_queryset(self, queryset, key=None):
+        """
+        Primes `queryset` with the results of a concurrent identical request,
+        or makes this request the one which searches the backend and shares
+        its results in `finalize_response()`. `key` defaults to the
+        `get_result_cache_key()` of the request.
+        """
+        if key is None:
+            key = self.get_result_cache_key()
+        flight, _ = getattr(self, "_single_flight_state", (None, None))
+        if flight is not None:
+            # Don't wait for the flight this request leads, if the queryset
+            # is filtered more than once.
+            if flight.key == key:
+                return queryset
+            self.land_single_flight()
+        flight, entry = flights.acquire(key, self.single_flight_alias, self.single_flight_timeout)
+        if flight is not None:
+            self._single_flight_state = (flight, queryset)
+        elif entry is not None:
+            if not entry["count"]:
+                return queryset.none()
+            # Every request waiting for the flight gets the same entry, and the
+            # serializers load the model instances into the results, so every
+            # request needs its own copies.
+            segments = [(start, [copy.copy(result) for result in results]) for start, results in entry["segments"]]
+            queryset = prime_queryset(queryset, dict(entry, segments=segments))
+        return queryset
+
+    def land_single_flight(self, response=None):
+        flight, queryset = getattr(self, "_single_flight_state", (None, None))
+        if flight is None:
+            return
+        entry = None
+        if response is not None and response.status_code == 200 and queryset.query._hit_count is not None:
+            entry = dump_queryset(queryset)
+        flights.land(flight, entry, self.single_flight_timeout)
+        self._single_flight_state = (None, None)
+
+    def dispatch(self, request, *args, **kwargs):
+        try:
+            return super(HaystackGenericAPIView, self).dispatch(request, *args, **kwargs)
+        finally:
+            # Never leave the requests waiting for this one hanging.
+            self.land_single_flight()
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super(HaystackGenericAPIView, self).finalize_response(request, response, *args, **kwargs)
+        self.land_single_flight(response)
+        key, queryset, cached_results = getattr(self, "_result_cache_state", (None, None, 0))
+        if key is not None and response.status_code == 200 and queryset.query._hit_count is not None:
+            # Only update the cache if we have fetched any new results.
+            if not cached_results or count_cached_results(queryset) > cached_results:
+                entry = dump_queryset(queryset)
+                get_cache(self.result_cache_alias).set(key, entry, self.result_cache_timeout)
+        self._result_cache_state = None
+
+        key, queryset = getattr(self, "_negative_cache_state", (None, None))
+        if key is not None and response.status_code == 200 and queryset.query._hit_count == 0:
+            self.negative_result_cache.set(key, True)
+        self._negative_cache_state = (None, None)
+        return response
+
 
 class SQHighlighterMixin(object):
     """
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, unicode_literals
+
+import re
+
+from django.utils.html import strip_tags
+
+from haystack.utils import Highlighter
+
+
+class CompiledHighlighter(Highlighter):
+    """
+    A drop-in replacement for the haystack ``Highlighter``, which can be
+    used as the ``highlighter_class`` on the ``HighlighterMixin``.
+
+    Instead of scanning the text once per query word, all the query words
+    are compiled into a single regular expression when the highlighter is
+    instantiated. Each text block is then scanned once in order to find the
+    matches, and the densest window of ``max_length`` characters is found
+    in a single pass over the matches. The windows and the highlighted
+    words are the same as those of the haystack ``Highlighter``.
+    """
+
+    def __init__(self, query, **kwargs):
+        super(CompiledHighlighter, self).__init__(query, **kwargs)
+
+        # Find the positions where any word starts with a zero-width match,
+        # since the words may overlap each other.
+        self.words = sorted(self.query_words)
+        self.pattern = None
+        if self.words:
+            self.pattern = re.compile(
+                "(?=%s)" % "|".join(re.escape(word) for word in self.words), re.UNICODE
+            )
+
+        if self.css_class:
+            self.hl_start = '<%s class="%s">' % (self.html_tag, self.css_class)
+        else:
+            self.hl_start = "<%s>" % self.html_tag
+        self.hl_end = "</%s>" % self.html_tag
+
+    def highlight(self, text_block):
+        self.text_block = strip_tags(text_block)
+        matches = self.find_matches(self.text_block)
+        start_offset, end_offset = self.find_best_window(matches)
+        return self.render_window(matches, start_offset, end_offset)
+
+    def highlight_many(self, text_blocks):
+        """
+        Highlights several text blocks (ie. multiple fields of a result)
+        with the same compiled query.
+        """
+        return [self.highlight(text_block) for text_block in text_blocks]
+
+    def find_matches(self, text):
+        """
+        Returns a sorted list of ``(offset, word)`` tuples for the query words
+        found in the lower cased `text`. Like the haystack ``Highlighter``,
+        the occurrences of a word don't overlap each other, but may overlap
+        the occurrences of other words.
+        """
+        if self.pattern is None:
+            return []
+
+        end_offset = len(text)
+        text = text.lower()
+        matches = []
+        next_offsets = dict((word, 0) for word in self.words)
+        for match in self.pattern.finditer(text, 0, end_offset):
+            offset = match.start()
+            for word in self.words:
+                if offset >= next_offsets[word] and text.startswith(word, offset, end_offset):
+                    matches.append((offset, word))
+                    next_offsets[word] = offset + len(word)
+        return matches
+
+    def find_best_window(self, matches):
+        """
+        Returns the ``(start, end)`` offsets of the window of ``max_length``
+        characters starting at the match which is followed by the most matches
+        within the window. We'll give deference to windows earlier in the
+        document, and the window starts at the beginning of the document if
+        no two matches are that close, unless the first match is beyond it.
+        """
+        if not matches:
+            return 0, self.max_length
+        if len(matches) == 1:
+            return matches[0][0], matches[0][0] + self.max_length
+
+        offsets = [offset for offset, _ in matches]
+        best_start, highest_density = 0, 0
+        if offsets[0] > self.max_length:
+            best_start = offsets[0]
+
+        last = 0
+        for first, start in enumerate(offsets[:-1]):
+            while last + 1 < len(offsets) and offsets[last + 1] - start < self.max_length:
+                last += 1
+            density = last - first + 1
+            if density > 1 and density > highest_density:
+                best_start, highest_density = start, density
+        return best_start, best_start + self.max_length
+
+    def render_window(self, matches, start_offset, end_offset):
+        """
+        Renders the text between `start_offset` and `end_offset`, with the
+        matches wrapped in the highlight html tag. Matches overlapping the
+        previously highlighted word are skipped.
+        """
+        text = self.text_block[start_offset:end_offset]
+        chunks = []
+        position, previous_end = 0, 0
+        for offset, word in matches:
+            offset -= start_offset
+            # Like the haystack ``Highlighter``, we check the text at every
+            # offset (with Python's slicing semantics) against the word.
+            actual_word = text[offset:offset + len(word)]
+            if actual_word.lower() != word or offset < previous_end:
+                continue
+            chunks.extend((text[previous_end:offset], self.hl_start, actual_word, self.hl_end))
+            previous_end = offset + len(word)
+            position = offset + len(actual_word)
+        chunks.append(text[position:])
+
+        highlighted_chunk = "".join(chunks)
+        if start_offset > 0:
+            highlighted_chunk = "...%s" % highlighted_chunk
+        if end_offset < len(self.text_block):
+            highlighted_chunk = "%s..." % highlighted_chunk
+        return highlighted_chunk
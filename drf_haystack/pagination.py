@@ -0,0 +1,488 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, unicode_literals
+
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.paginator import EmptyPage, InvalidPage, Page, PageNotAnInteger, Paginator as DjangoPaginator
+from django.template import Context, loader
+from django.utils import six
+from django.utils.translation import ugettext_lazy as _
+
+from haystack.backends import SQ
+from haystack.constants import DJANGO_ID, ID
+
+from rest_framework.compat import OrderedDict
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, LimitOffsetPagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils import encoders
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class HaystackPaginator(DjangoPaginator):
+    """
+    A Django paginator which refuses to go beyond `max_result_window`
+    results, which is the deepest most search backends are able (or willing)
+    to page through a result set with an offset.
+
+    The Django paginator counts the results before slicing the page,
+    which makes a ``SearchQuerySet`` hit the search backend twice. We slice
+    the page first instead, so the total number of results is read from the
+    same backend response as the results on the page.
+    """
+
+    def __init__(self, object_list, per_page, orphans=0, allow_empty_first_page=True, max_result_window=None):
+        super(HaystackPaginator, self).__init__(object_list, per_page, orphans, allow_empty_first_page)
+        self.max_result_window = max_result_window
+
+    def page(self, number):
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger("That page number is not an integer")
+        if number < 1:
+            raise EmptyPage("That page number is less than 1")
+        if self.max_result_window is not None and number > self.max_window_pages:
+            raise InvalidPage(_("That page is beyond the maximum result window of %d results.")
+                              % self.max_result_window)
+
+        # Fetching the page primes the hit count of the queryset,
+        # so validating the page number won't make another request.
+        bottom = (number - 1) * self.per_page
+        object_list = self.object_list[bottom:bottom + self.per_page + self.orphans]
+        number = self.validate_number(number)
+        if bottom + self.per_page + self.orphans < self.count:
+            object_list = object_list[:self.per_page]
+        return Page(object_list, number, self)
+
+    def validate_number(self, number):
+        number = super(HaystackPaginator, self).validate_number(number)
+        if self.max_result_window is not None and number > self.max_window_pages:
+            raise InvalidPage(_("That page is beyond the maximum result window of %d results.")
+                              % self.max_result_window)
+        return number
+
+    @property
+    def max_window_pages(self):
+        return max(self.max_result_window // self.per_page, 1)
+
+    @property
+    def num_pages(self):
+        num_pages = super(HaystackPaginator, self).num_pages
+        if self.max_result_window is not None:
+            num_pages = min(num_pages, self.max_window_pages)
+        return num_pages
+
+
+class HaystackPageNumberPagination(PageNumberPagination):
+    """
+    A `PageNumberPagination` for search results, which does not serve
+    pages beyond the `max_result_window`.
+    """
+
+    django_paginator_class = HaystackPaginator
+
+    # Set to `None` to allow paginating all the way through the results.
+    max_result_window = 10000
+
+    def get_paginator(self, queryset, page_size):
+        return self.django_paginator_class(queryset, page_size, max_result_window=self.max_result_window)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page = self.get_page(queryset, request)
+        return list(page) if page is not None else None
+
+    def paginate_lazy_queryset(self, queryset, request, view=None):
+        """
+        Like `paginate_queryset()`, but returns the results on the page
+        without fetching them, ie. a slice of a `LazySearchSlice`.
+        """
+        page = self.get_page(queryset, request)
+        return page.object_list if page is not None else None
+
+    def get_page(self, queryset, request):
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        paginator = self.get_paginator(queryset, page_size)
+        page_number = request.query_params.get(self.page_query_param, 1)
+        if page_number in self.last_page_strings:
+            page_number = paginator.num_pages
+
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            msg = self.invalid_page_message.format(
+                page_number=page_number, message=six.text_type(exc)
+            )
+            raise NotFound(msg)
+
+        if paginator.num_pages > 1 and self.template is not None:
+            # The browsable API should display pagination controls.
+            self.display_page_controls = True
+
+        self.request = request
+        return self.page
+
+
+class HaystackLimitOffsetPagination(LimitOffsetPagination):
+    """
+    A `LimitOffsetPagination` for search results, which does not serve
+    results beyond the `max_result_window`.
+    """
+
+    # Set to `None` to allow paginating all the way through the results.
+    max_result_window = 10000
+
+    invalid_offset_message = _("Invalid offset: the maximum result window is {max_result_window} results.")
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.set_window(request):
+            return None
+
+        # Fetching the results primes the hit count of the queryset,
+        # so counting the results won't make another request.
+        results = list(queryset[self.offset:self.offset + self.limit])
+        self.set_count(queryset.count())
+        return results
+
+    def paginate_lazy_queryset(self, queryset, request, view=None):
+        """
+        Like `paginate_queryset()`, but returns the results on the page
+        without fetching them, ie. a slice of a `LazySearchSlice`.
+        """
+        if not self.set_window(request):
+            return None
+        self.set_count(queryset.count())
+        return queryset[self.offset:self.offset + self.limit]
+
+    def set_window(self, request):
+        limit = self.get_limit(request)
+        if limit is None:
+            return False
+
+        offset = self.get_offset(request)
+        if self.max_result_window is not None:
+            if offset >= self.max_result_window:
+                raise NotFound(self.invalid_offset_message.format(max_result_window=self.max_result_window))
+            # Don't let the page reach beyond the result window.
+            limit = min(limit, self.max_result_window - offset)
+
+        self.limit, self.offset = limit, offset
+        self.request = request
+        return True
+
+    def set_count(self, count):
+        self.count = count
+        if self.count > self.limit and self.template is not None:
+            self.display_page_controls = True
+
+    def get_next_link(self):
+        if self.max_result_window is not None and self.offset + self.limit >= self.max_result_window:
+            return None
+        return super(HaystackLimitOffsetPagination, self).get_next_link()
+
+
+class HaystackCursorPagination(BasePagination):
+    """
+    A cursor based pagination for search results, which doesn't make the
+    search backend collect and skip all the results before the current page.
+
+    The results are ordered by `ordering`, with `uid_field` as a tiebreaker.
+    The cursor holds the values of these fields for the last
+    (or first, when paginating backwards) result on the current page, and the
+    next page is fetched with a range query starting after these values.
+    The fields in `ordering` must be sortable, and support range and exact
+    lookups in the search backend.
+    """
+
+    cursor_query_param = "cursor"
+    page_size = api_settings.PAGE_SIZE
+    invalid_cursor_message = _("Invalid cursor")
+    template = "rest_framework/pagination/previous_and_next.html"
+
+    # A field name or a list of field names to order by. Prefix a
+    # field name with "-" in order to sort in descending order.
+    ordering = ()
+
+    # A unique, sortable and not analyzed field used as a tiebreaker,
+    # such as "django_id" or the `_exact` variant of a faceted field.
+    uid_field = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(view)
+        self.reverse, self.position = self.decode_cursor(request)
+
+        ordering = self.ordering
+        if self.reverse:
+            ordering = self.reverse_ordering(ordering)
+
+        queryset = queryset.order_by(*ordering)
+        if self.position is not None:
+            queryset = queryset.filter(self.get_cursor_query(ordering, self.position))
+
+        # We always fetch an extra result in order to tell
+        # if there is another page following this one.
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        has_following_page = len(results) > self.page_size
+
+        if self.reverse:
+            # The results have been fetched in reverse order.
+            self.page.reverse()
+            self.has_next = self.position is not None
+            self.has_previous = has_following_page
+        else:
+            self.has_next = has_following_page
+            self.has_previous = self.position is not None
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+    def get_page_size(self, request):
+        return self.page_size
+
+    def get_ordering(self, view):
+        """
+        Returns a tuple of field names to order the results by,
+        ending with the `uid_field`.
+
+        Raises ``ImproperlyConfigured`` if the `uid_field` isn't set, or is
+        the haystack ``id`` field, which Elasticsearch analyzes, so it can't
+        be reliably sorted or queried by range.
+        """
+        ordering = self.ordering
+        if isinstance(ordering, six.string_types):
+            ordering = (ordering,)
+
+        uid_field = self.uid_field
+        if uid_field is None or uid_field == ID:
+            raise ImproperlyConfigured(
+                "%s.uid_field must be set to a unique, sortable and not analyzed search index field, "
+                "such as '%s'." % (self.__class__.__name__, DJANGO_ID)
+            )
+        if uid_field not in [field.lstrip("-") for field in ordering]:
+            ordering = tuple(ordering) + (uid_field,)
+        return tuple(ordering)
+
+    @staticmethod
+    def reverse_ordering(ordering):
+        return tuple(field[1:] if field.startswith("-") else "-%s" % field for field in ordering)
+
+    @staticmethod
+    def get_cursor_query(ordering, position):
+        """
+        Returns a SQ object matching the results which are sorted after
+        `position` according to `ordering`. For an ordering of ``(a, -b, c)``
+        this would be ``a > A OR (a = A AND b < B) OR (a = A AND b = B AND c > C)``.
+        """
+        query, preceding = None, None
+        for field, value in zip(ordering, position):
+            field_name = field.lstrip("-")
+            lookup = "lt" if field.startswith("-") else "gt"
+            term = SQ(**{"%s__%s" % (field_name, lookup): value})
+            if preceding is not None:
+                term = preceding & term
+            query = term if query is None else query | term
+
+            exact = SQ(**{"%s__exact" % field_name: value})
+            preceding = exact if preceding is None else preceding & exact
+        return query
+
+    def get_position(self, result):
+        """
+        Returns the values of the ordering fields for `result`.
+        """
+        return [
+            result.pk if field.lstrip("-") == DJANGO_ID else getattr(result, field.lstrip("-"))
+            for field in self.ordering
+        ]
+
+    def decode_cursor(self, request):
+        """
+        Returns a ``(reverse, position)`` tuple from the cursor in `request`.
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return False, None
+
+        try:
+            cursor = json.loads(urlsafe_b64decode(encoded.encode("ascii")).decode("utf-8"))
+            reverse, position = bool(cursor.get("r", False)), cursor["p"]
+            if not isinstance(position, list) or len(position) != len(self.ordering):
+                raise ValueError("Position does not match the ordering.")
+        except (TypeError, ValueError, KeyError, AttributeError):
+            raise NotFound(self.invalid_cursor_message)
+        return reverse, position
+
+    def encode_cursor(self, reverse, position):
+        """
+        Returns the current url with an encoded cursor for `position`.
+        """
+        cursor = {"p": position}
+        if reverse:
+            cursor["r"] = 1
+        data = json.dumps(cursor, cls=encoders.JSONEncoder, separators=(",", ":"))
+        encoded = urlsafe_b64encode(data.encode("utf-8")).decode("ascii")
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if self.page:
+            return self.encode_cursor(False, self.get_position(self.page[-1]))
+        # We have paginated backwards past the first result.
+        return self.encode_cursor(False, self.position)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if self.page:
+            return self.encode_cursor(True, self.get_position(self.page[0]))
+        # We have paginated forward past the last result.
+        return self.encode_cursor(True, self.position)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ("next", self.get_next_link()),
+            ("previous", self.get_previous_link()),
+            ("results", data)
+        ]))
+
+    def get_html_context(self):
+        return {
+            "previous_url": self.get_previous_link(),
+            "next_url": self.get_next_link()
+        }
+
+    def to_html(self):
+        template = loader.get_template(self.template)
+        return template.render(Context(self.get_html_context()))
+
+
+class HaystackNoCountPagination(HaystackPageNumberPagination):
+    """
+    A page number based pagination which never asks the search backend
+    for the total number of results. Instead, it fetches one result more
+    than the page size in order to tell if there is a next page.
+    The response only holds the ``next`` and ``previous`` links, which
+    makes it suitable for ie. autocomplete and infinite scrolling clients.
+    """
+
+    template = "rest_framework/pagination/previous_and_next.html"
+
+    # The results must be fetched in order to tell if there is a next page.
+    paginate_lazy_queryset = None
+
+    def get_page_number(self, request):
+        page_number = request.query_params.get(self.page_query_param, 1)
+        try:
+            number = int(page_number)
+            if number < 1:
+                raise ValueError()
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_page_message.format(
+                page_number=page_number, message=_("That page number is not a positive integer.")
+            ))
+
+        if self.max_result_window is not None and number > max(self.max_result_window // self.page_size, 1):
+            raise NotFound(self.invalid_page_message.format(
+                page_number=page_number,
+                message=_("That page is beyond the maximum result window of %d results.") % self.max_result_window
+            ))
+        return number
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.request = request
+        self.page_number = self.get_page_number(request)
+        offset = (self.page_number - 1) * self.page_size
+
+        # Fetch an extra result in order to tell if there is a next page.
+        results = list(queryset[offset:offset + self.page_size + 1])
+        if not results and self.page_number > 1:
+            raise NotFound(self.invalid_page_message.format(
+                page_number=self.page_number, message=_("That page contains no results")
+            ))
+
+        self.results = results[:self.page_size]
+        self.has_next = len(results) > self.page_size
+        if self.max_result_window is not None and (self.page_number + 1) * self.page_size > self.max_result_window:
+            self.has_next = False
+        self.has_previous = self.page_number > 1
+
+        if (self.has_next or self.has_previous) and self.template is not None:
+            self.display_page_controls = True
+        return self.results
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ("next", self.get_next_link()),
+            ("previous", self.get_previous_link()),
+            ("results", data)
+        ]))
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.page_query_param, self.page_number + 1)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        url = self.request.build_absolute_uri()
+        if self.page_number == 2:
+            return remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.page_query_param, self.page_number - 1)
+
+    def get_html_context(self):
+        return {
+            "previous_url": self.get_previous_link(),
+            "next_url": self.get_next_link()
+        }
+
+
+class HaystackApproximateCountPagination(HaystackNoCountPagination):
+    """
+    Like the `HaystackNoCountPagination`, but also reports the total number
+    of results, as found in the same backend response as the results. The
+    total is capped at `max_count`, in which case ``count_is_approximate``
+    is true, and the count should be read as "more than `max_count`".
+    """
+
+    max_count = 1000
+
+    def paginate_queryset(self, queryset, request, view=None):
+        results = super(HaystackApproximateCountPagination, self).paginate_queryset(queryset, request, view)
+        if results is not None:
+            # The hit count is cached on the queryset by the previous slicing,
+            # so this doesn't hit the search backend again.
+            count = queryset.count()
+            self.count_is_approximate = self.max_count is not None and count > self.max_count
+            self.count = self.max_count if self.count_is_approximate else count
+        return results
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ("count", self.count),
+            ("count_is_approximate", self.count_is_approximate),
+            ("next", self.get_next_link()),
+            ("previous", self.get_previous_link()),
+            ("results", data)
+        ]))
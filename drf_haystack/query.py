@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, unicode_literals
+
+import copy
+import operator
+
+from django.utils import six, tree
+
+from haystack.backends import SQ
+from haystack.constants import DEFAULT_OPERATOR
+from haystack.query import SearchQuerySet
+
+from .cache import prime_queryset
+
+
+def _sq_key(child):
+    # A hashable key identifying the query of an SQ node or an SQ
+    # ``(lookup, value)`` tuple, used to find duplicate terms.
+    if isinstance(child, tree.Node):
+        if len(child.children) == 1 and not child.negated:
+            return _sq_key(child.children[0])
+        return (child.connector, child.negated, tuple(_sq_key(grandchild) for grandchild in child.children))
+    lookup, value = child
+    return (lookup, repr(value))
+
+
+def _conjuncts(node):
+    # The terms which must all match for `node` to match.
+    if (node.connector == node.AND or len(node.children) == 1) and not node.negated:
+        return node.children
+    return [node]
+
+
+def normalize_sq(node):
+    """
+    Returns a simplified copy of the SQ `node`, where nested nodes with the
+    same connector and nodes with a single term are merged into their
+    parent node, and duplicate terms are removed.
+    """
+    children = []
+    for child in node.children:
+        if isinstance(child, tree.Node):
+            child = normalize_sq(child)
+            if not child.children:
+                continue
+            if not child.negated and (child.connector == node.connector or len(child.children) == 1):
+                children.extend(child.children)
+                continue
+        children.append(child)
+
+    unique_children, seen = [], set()
+    for child in children:
+        key = _sq_key(child)
+        if key not in seen:
+            seen.add(key)
+            unique_children.append(child)
+
+    normalized = copy.copy(node)
+    normalized.children = unique_children
+    return normalized
+
+
+def is_contradiction(terms, exclude_terms=None):
+    """
+    Returns True if no document can match the normalized SQ filter `terms`
+    without also matching the SQ exclusion `exclude_terms`, ie. if a term is
+    both required and negated, or every term in `exclude_terms` is required
+    by `terms`. Contradictions which can only be found by evaluating the
+    terms, such as ``id__gt=10`` and ``id__lt=5``, are not detected.
+    """
+    if not terms:
+        return False
+
+    conjuncts = _conjuncts(terms)
+    required = set(_sq_key(child) for child in conjuncts)
+    for child in conjuncts:
+        if isinstance(child, tree.Node) and child.negated:
+            positive = copy.copy(child)
+            positive.negated = False
+            if _sq_key(positive) in required:
+                return True
+
+    if exclude_terms:
+        return all(_sq_key(child) in required for child in _conjuncts(exclude_terms))
+    return False
+
+
+def prime_results(queryset, results):
+    """
+    Fills `queryset` with all of its `results`, so it won't query the
+    backend when it is sliced, counted or iterated over. Returns an empty
+    queryset if there are no `results`, as a queryset with an empty result
+    cache would query the backend again.
+    """
+    if not results:
+        return queryset.none()
+    return prime_queryset(queryset, {"count": len(results), "segments": [(0, results)]})
+
+
+class HaystackQueryBuilder(object):
+    """
+    Collects the filters, exclusions, spatial filters, boosts and
+    highlighting requested by the filter backends of a view, and applies
+    them to `queryset` with a single clone, rather than cloning the
+    ``SearchQuerySet`` (and its query) once for every call.
+
+    The filters are merged and normalized (see `normalize_sq()`), and if
+    they contradict the exclusions, an empty queryset is returned without
+    querying the backend.
+
+    The query parameters are parsed once, and are shared by every filter
+    backend as the immutable `params` ``QueryDict``.
+    """
+
+    def __init__(self, queryset, params):
+        self.queryset = queryset
+        self.params = params
+        self.filters = []
+        self.exclusions = []
+        self.dwithin = []
+        self.distances = []
+        self.boosts = []
+        self.highlight = False
+        self.empty = False
+        self.resolver_filter = None
+        self.resolver = None
+
+    def add_filter(self, query_filter):
+        self.filters.append(query_filter)
+
+    def add_exclusion(self, query_filter):
+        self.exclusions.append(query_filter)
+
+    def add_dwithin(self, field, point, distance):
+        self.dwithin.append((field, point, distance))
+
+    def add_distance(self, field, point):
+        self.distances.append((field, point))
+
+    def add_boost(self, term, boost):
+        self.boosts.append((term, boost))
+
+    def add_highlight(self):
+        self.highlight = True
+
+    def set_resolver(self, query_filter, resolver):
+        """
+        Registers a callable which is passed the filtered queryset if
+        `query_filter` is the only clause, and returns the queryset to use,
+        ie. primed with results from memory (see `prime_results()`).
+        """
+        self.resolver_filter = query_filter
+        self.resolver = resolver
+
+    def get_resolver(self):
+        if self.resolver is None or self.filters != [self.resolver_filter]:
+            return None
+        if self.exclusions or self.dwithin or self.distances or self.boosts or self.highlight:
+            return None
+        if self.queryset.query.query_filter:
+            return None
+        return self.resolver
+
+    def set_empty(self):
+        """
+        Marks the query as one which can't match any documents, so that
+        an empty queryset is returned without querying the backend.
+        """
+        self.empty = True
+
+    def has_clauses(self):
+        return bool(self.filters or self.exclusions or self.dwithin or self.distances or self.boosts or self.highlight)
+
+    def apply(self):
+        """
+        Returns a clone of `queryset` with the collected clauses applied,
+        in the same way as the corresponding ``SearchQuerySet`` methods.
+        """
+        if self.empty:
+            return self.queryset.none()
+        if not self.has_clauses():
+            return self.queryset
+
+        resolver = self.get_resolver()
+
+        filters = [normalize_sq(query_filter) for query_filter in self.filters]
+        if len(filters) > 1 and DEFAULT_OPERATOR == "AND":
+            filters = [normalize_sq(six.moves.reduce(operator.and_, filters))]
+
+        exclusions, seen = [], set()
+        for query_filter in self.exclusions:
+            query_filter = normalize_sq(query_filter)
+            key = _sq_key(query_filter)
+            if key not in seen:
+                seen.add(key)
+                exclusions.append(query_filter)
+
+        # With the `OR` operator, the filters are `OR`-ed with the query.
+        if DEFAULT_OPERATOR == "AND":
+            for query_filter in filters:
+                if is_contradiction(query_filter) or \
+                        any(is_contradiction(query_filter, exclusion) for exclusion in exclusions):
+                    return self.queryset.none()
+
+        clone = self.queryset._clone()
+        query = clone.query
+        for query_filter in filters:
+            query.add_filter(SQ(query_filter), use_or=DEFAULT_OPERATOR == "OR")
+        for query_filter in exclusions:
+            query.add_filter(~SQ(query_filter))
+        for field, point, distance in self.dwithin:
+            query.add_dwithin(field, point, distance)
+        for field, point in self.distances:
+            query.add_distance(field, point)
+        for term, boost in self.boosts:
+            query.add_boost(term, boost)
+        if self.highlight and isinstance(clone, SearchQuerySet):
+            query.add_highlight()
+        if resolver is not None:
+            return resolver(clone)
+        return clone
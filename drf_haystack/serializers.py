@@ -6,16 +6,21 @@ import copy
 import warnings
 from itertools import chain
 
+from django.conf import settings
 from django.core.exceptions import ImproperlyConfigured
 from django.utils import six
+from django.utils.encoding import force_text
 
-from haystack import fields as haystack_fields
+from haystack import connections, fields as haystack_fields
+from haystack.constants import DEFAULT_ALIAS
+from haystack.exceptions import NotHandled
 from haystack.query import EmptySearchQuerySet
 from haystack.utils import Highlighter
 
 from rest_framework import serializers
 from rest_framework.compat import OrderedDict
-from rest_framework.fields import empty
+from rest_framework.fields import SkipField, empty
+from rest_framework.serializers import LIST_SERIALIZER_KWARGS
 from rest_framework.utils.field_mapping import ClassLookupDict, get_field_kwargs
 
 from .fields import (
@@ -51,6 +56,9 @@ class HaystackSerializer(serializers.Serializer):
         haystack_fields.NgramField: HaystackCharField,
     })
 
+    # Compiled field plans, keyed by serializer class. See `_get_field_plan()`.
+    _field_plans = {}
+
     def __init__(self, instance=None, data=empty, **kwargs):
         super(HaystackSerializer, self).__init__(instance, data, **kwargs)
 
@@ -64,6 +72,19 @@ class HaystackSerializer(serializers.Serializer):
         if not self.instance:
             self.instance = EmptySearchQuerySet()
 
+        # Index classes for the models we have seen so far. Looking up
+        # `SearchResult.searchindex` goes through the unified index every
+        # time, so we only do it once per model.
+        self._index_classes_by_model = {}
+
+        # Serializer instances used by `multi_serializer_representation()`,
+        # keyed by index class and stored along with the context they got.
+        self._child_serializers = {}
+
+        # Representation plans for the bound fields, keyed by index class.
+        # See `_get_representation_plan()`.
+        self._representation_plans = {}
+
     @staticmethod
     def _get_default_field_kwargs(model, field):
         """
@@ -87,9 +108,36 @@ class HaystackSerializer(serializers.Serializer):
 
         return kwargs
 
-    def get_fields(self):
+    @classmethod
+    def clear_field_cache(cls):
         """
-        Get the required fields for serializing the result.
+        Drops the compiled field plans for this serializer class and all
+        of its subclasses. Call this if you modify the ``Meta`` class or
+        the search indexes at runtime (ie. in tests).
+        """
+        for serializer_cls in list(HaystackSerializer._field_plans):
+            if issubclass(serializer_cls, cls):
+                del HaystackSerializer._field_plans[serializer_cls]
+
+    def _get_field_plan(self):
+        """
+        Returns the compiled field plan for this serializer class,
+        compiling it on first access.
+        """
+        serializer_cls = self.__class__
+        try:
+            return HaystackSerializer._field_plans[serializer_cls]
+        except KeyError:
+            plan = self._compile_field_plan()
+            HaystackSerializer._field_plans[serializer_cls] = plan
+            return plan
+
+    def _compile_field_plan(self):
+        """
+        Compiles the `Meta` options and the index fields into a frozen
+        field plan. The plan is a tuple of ``(field_name, field_class, kwargs)``
+        entries in the order the fields should appear, where ``field_class``
+        is ``None`` for explicitly declared fields.
         """
 
         fields = getattr(self.Meta, "fields", [])
@@ -98,20 +146,24 @@ class HaystackSerializer(serializers.Serializer):
         if fields and exclude:
             raise ImproperlyConfigured("Cannot set both `fields` and `exclude`.")
 
-        ignore_fields = getattr(self.Meta, "ignore_fields", [])
+        fields, exclude = frozenset(fields), frozenset(exclude)
+        ignore_fields = frozenset(getattr(self.Meta, "ignore_fields", []))
         indices = getattr(self.Meta, "index_classes")
 
-        declared_fields = copy.deepcopy(self._declared_fields)
         prefix_field_names = len(indices) > 1
         field_mapping = OrderedDict()
 
         # overlapping fields on multiple indices is supported by internally prefixing the field
         # names with the index class to which they belong or, optionally, a user-provided alias
         # for the index.
-        for index_cls in self.Meta.index_classes:
+        for index_cls in indices:
             prefix = ""
             if prefix_field_names:
                 prefix = "_%s__" % self._get_index_class_name(index_cls)
+
+            # Look up the field attributes on the current index model,
+            # in order to correctly instantiate the serializer field.
+            model = index_cls().get_model()
             for field_name, field_type in six.iteritems(index_cls.fields):
                 orig_name = field_name
                 field_name = "%s%s" % (prefix, field_name)
@@ -123,48 +175,119 @@ class HaystackSerializer(serializers.Serializer):
                 elif orig_name in exclude or field_name in exclude or orig_name in ignore_fields or field_name in ignore_fields:
                     continue
 
-                # Look up the field attributes on the current index model,
-                # in order to correctly instantiate the serializer field.
-                model = index_cls().get_model()
                 kwargs = self._get_default_field_kwargs(model, field_type)
-                kwargs['prefix_field_names'] = prefix_field_names
-                field_mapping[field_name] = self._field_mapping[field_type](**kwargs)
+                kwargs["prefix_field_names"] = prefix_field_names
+                field_mapping[field_name] = (self._field_mapping[field_type], tuple(kwargs.items()))
 
         # Add any explicitly declared fields. They *will* override any index fields
         # in case of naming collision!.
-        if declared_fields:
-            for field_name in declared_fields:
-                if field_name in field_mapping:
-                    warnings.warn("Field '{field}' already exists in the field list. This *will* "
-                                  "overwrite existing field '{field}'".format(field=field_name))
+        for field_name in self._declared_fields:
+            if field_name in field_mapping:
+                warnings.warn("Field '{field}' already exists in the field list. This *will* "
+                              "overwrite existing field '{field}'".format(field=field_name))
+            field_mapping[field_name] = (None, ())
+
+        return tuple((name, field_class, kwargs) for name, (field_class, kwargs) in field_mapping.items())
+
+    def get_fields(self):
+        """
+        Get the required fields for serializing the result.
+        The field plan is compiled once per serializer class, so
+        this only has to instantiate the fields.
+        """
+
+        declared_fields = copy.deepcopy(self._declared_fields)
+        field_mapping = OrderedDict()
+        for field_name, field_class, kwargs in self._get_field_plan():
+            if field_class is None:
                 field_mapping[field_name] = declared_fields[field_name]
+            else:
+                field_mapping[field_name] = field_class(**dict(kwargs))
         return field_mapping
 
+    def _get_index_class(self, instance):
+        """
+        Returns the search index class for the model of a search result.
+        """
+        try:
+            return self._index_classes_by_model[instance.model]
+        except KeyError:
+            index_cls = type(instance.searchindex)
+            self._index_classes_by_model[instance.model] = index_cls
+            return index_cls
+
+    def _get_representation_plan(self, index_cls):
+        """
+        Returns the compiled representation plan for results from `index_cls`,
+        compiling it on first access. The plan is built from the bound fields,
+        which may differ between instances, so it is kept per instance.
+        """
+        try:
+            return self._representation_plans[index_cls]
+        except KeyError:
+            plan = self._representation_plans[index_cls] = self._compile_representation_plan(index_cls)
+            return plan
+
+    def _compile_representation_plan(self, index_cls):
+        """
+        Compiles the bound fields which should be rendered for results from
+        `index_cls` into a tuple of ``(field_name, output_name)`` pairs.
+
+        Since we might be dealing with multiple indexes, some fields might
+        not be valid for all results. Fields which are prefixed with another
+        index name are left out, and prefixed fields for the current index
+        are renamed to their unprefixed names (rendered after the common fields).
+        With a single index, only the fields compiled from the index fields may
+        be left out, so fields added by ie. `get_fields()` are always rendered.
+        """
+        prefix_field_names = len(getattr(self.Meta, "index_classes")) > 1
+        current_index = self._get_index_class_name(index_cls)
+        index_field_names = frozenset(
+            field_name for field_name, field_class, kwargs in self._get_field_plan() if field_class is not None
+        )
+
+        common_fields, index_fields = [], []
+        for field_name in self.fields:
+            if prefix_field_names:
+                parts = field_name.split("__")
+                if len(parts) > 1:
+                    index = parts[0][1:]  # trim the preceding '_'
+                    if index == current_index:
+                        index_fields.append((field_name, parts[1]))
+                else:
+                    common_fields.append((field_name, field_name))
+            elif field_name not in index_field_names or field_name in index_cls.fields:
+                common_fields.append((field_name, field_name))
+        return tuple(common_fields + index_fields)
+
     def to_representation(self, instance):
         """
         If we have a serializer mapping, use that.  Otherwise, use standard serializer behavior
         Since we might be dealing with multiple indexes, some fields might
-        not be valid for all results. Do not render the fields which don't belong
-        to the search result.
+        not be valid for all results. Only the fields which belong to the
+        search result are rendered (see `_compile_representation_plan()`).
         """
         if getattr(self.Meta, "serializers", None):
             ret = self.multi_serializer_representation(instance)
         else:
-            ret = super(HaystackSerializer, self).to_representation(instance)
-            prefix_field_names = len(getattr(self.Meta, "index_classes")) > 1
-            current_index = self._get_index_class_name(type(instance.searchindex))
-            for field in self.fields.keys():
-                orig_field = field
-                if prefix_field_names:
-                    parts = field.split("__")
-                    if len(parts) > 1:
-                        index = parts[0][1:]  # trim the preceding '_'
-                        field = parts[1]
-                        if index == current_index:
-                            ret[field] = ret[orig_field]
-                        del ret[orig_field]
-                elif field not in chain(instance.searchindex.fields.keys(), self._declared_fields.keys()):
-                    del ret[orig_field]
+            ret = OrderedDict()
+            fields = self.fields
+            for field_name, output_name in self._get_representation_plan(self._get_index_class(instance)):
+                field = fields.get(field_name)
+                if field is None or field.write_only:
+                    continue
+
+                try:
+                    attribute = field.get_attribute(instance)
+                except SkipField:
+                    continue
+
+                # We skip `to_representation` for `None` values so that
+                # fields do not have to explicitly deal with that case.
+                if attribute is None:
+                    ret[output_name] = None
+                else:
+                    ret[output_name] = field.to_representation(attribute)
 
         # include the highlighted field in either case
         if getattr(instance, "highlighted", None):
@@ -172,12 +295,20 @@ class HaystackSerializer(serializers.Serializer):
         return ret
 
     def multi_serializer_representation(self, instance):
-        serializers = self.Meta.serializers
-        index = instance.searchindex
-        serializer_class = serializers.get(type(index), None)
-        if not serializer_class:
-            raise ImproperlyConfigured("Could not find serializer for %s in mapping" % index)
-        return serializer_class(context=self._context).to_representation(instance)
+        """
+        Serializes `instance` with the serializer mapped to its index class.
+        The serializer instance is reused for all results from the same index
+        for as long as our context stays the same.
+        """
+        index_cls = self._get_index_class(instance)
+        context, serializer = self._child_serializers.get(index_cls, (None, None))
+        if serializer is None or context is not self._context:
+            serializer_class = self.Meta.serializers.get(index_cls, None)
+            if not serializer_class:
+                raise ImproperlyConfigured("Could not find serializer for %s in mapping" % index_cls)
+            serializer = serializer_class(context=self._context)
+            self._child_serializers[index_cls] = (self._context, serializer)
+        return serializer.to_representation(instance)
 
     def _get_index_class_name(self, index_cls):
         """
@@ -189,13 +320,208 @@ class HaystackSerializer(serializers.Serializer):
         return aliases.get(cls_name, cls_name.split('.')[-1])
 
 
+class HaystackFastSerializer(HaystackSerializer):
+    """
+    A read-only `HaystackSerializer` for search listings.
+
+    Instead of going through the serializer field machinery for every
+    result, the fields are compiled into a flat tuple of
+    ``(output_name, attribute, formatter, field_name)`` entries per index,
+    and each result is rendered into a plain ``dict`` in a single loop.
+    Explicitly declared fields are still rendered by their serializer field.
+    """
+
+    # Formatters for the index field types which don't need a field
+    # instance in order to be rendered.
+    _fast_formatters = {
+        HaystackCharField: six.text_type,
+        HaystackFloatField: float,
+        HaystackIntegerField: int,
+    }
+
+    def __init__(self, instance=None, data=empty, **kwargs):
+        super(HaystackFastSerializer, self).__init__(instance, data, **kwargs)
+
+        # Row plans for the bound fields, keyed by index class.
+        # See `_get_row_plan()`.
+        self._row_plans = {}
+
+    def _get_row_plan(self, index_cls):
+        """
+        Returns the compiled row plan for results from `index_cls`,
+        compiling it on first access.
+        """
+        try:
+            return self._row_plans[index_cls]
+        except KeyError:
+            plan = self._row_plans[index_cls] = self._compile_row_plan(index_cls)
+            return plan
+
+    def _compile_row_plan(self, index_cls):
+        """
+        Compiles the representation plan for `index_cls` into a tuple of
+        ``(output_name, attribute, formatter, field_name)`` entries, where
+        ``formatter`` is ``None`` for the fields which aren't compiled from
+        the index fields, such as explicitly declared fields.
+        """
+        field_classes = dict((name, field_class) for name, field_class, kwargs in self._get_field_plan())
+
+        plan = []
+        for field_name, output_name in self._get_representation_plan(index_cls):
+            field = self.fields[field_name]
+            if field.write_only:
+                continue
+            field_class = field_classes.get(field_name)
+            if field_class is None or type(field) is not field_class:
+                plan.append((output_name, None, None, field_name))
+                continue
+
+            formatter = self._fast_formatters.get(field_class, field.to_representation)
+            plan.append((output_name, field.convert_field_name(field_name), formatter, field_name))
+        return tuple(plan)
+
+    def to_representation(self, instance):
+        if getattr(self.Meta, "serializers", None):
+            return super(HaystackFastSerializer, self).to_representation(instance)
+
+        ret = {}
+        for output_name, attribute, formatter, field_name in self._get_row_plan(self._get_index_class(instance)):
+            if formatter is None:
+                field = self.fields[field_name]
+                try:
+                    value = field.get_attribute(instance)
+                except SkipField:
+                    continue
+                ret[output_name] = None if value is None else field.to_representation(value)
+                continue
+
+            value = getattr(instance, attribute)
+            ret[output_name] = None if value is None else formatter(value)
+
+        if getattr(instance, "highlighted", None):
+            ret["highlighted"] = instance.highlighted[0]
+        return ret
+
+
+class HaystackObjectListSerializer(serializers.ListSerializer):
+    """
+    A `ListSerializer` which loads the model objects for all the search
+    results in the list with one query per model, and attaches them to
+    the results before the child serializer runs.
+
+    Results whose object could not be found in the database (ie. it has
+    been deleted since it was indexed) are left out of the response.
+    """
+
+    def load_objects(self, results):
+        """
+        Loads and attaches the model objects for `results` in bulk.
+        Returns the results which have an object.
+        """
+        models_pks = OrderedDict()
+        for result in results:
+            if getattr(result, "_object", None) is None:
+                models_pks.setdefault(result.model, []).append(result.pk)
+
+        loaded_objects = {}
+        for model, pks in six.iteritems(models_pks):
+            queryset = self.child.get_object_queryset(model)
+            # Search results keep their primary keys as strings
+            loaded_objects[model] = dict(
+                (force_text(pk), obj) for pk, obj in six.iteritems(queryset.in_bulk(pks))
+            )
+
+        ret = []
+        for result in results:
+            if getattr(result, "_object", None) is None:
+                obj = loaded_objects[result.model].get(force_text(result.pk))
+                if obj is None:
+                    continue
+                result.object = obj
+            ret.append(result)
+        return ret
+
+    def to_representation(self, data):
+        return super(HaystackObjectListSerializer, self).to_representation(self.load_objects(list(data)))
+
+
 class HaystackSerializerMixin(object):
     """
     This mixin can be added to a rerializer to use the actual object as the data source for serialization rather
     than the data stored in the search index fields.  This makes it easy to return data from search results in
     the same format as elswhere in your API and reuse your existing serializers
+
+    When serializing a list of results, the objects are loaded in bulk by the
+    `HaystackObjectListSerializer`, unless the Meta class specifies another
+    `list_serializer_class`.
     """
 
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        meta = getattr(cls, "Meta", None)
+        if hasattr(meta, "list_serializer_class"):
+            return super(HaystackSerializerMixin, cls).many_init(*args, **kwargs)
+
+        allow_empty = kwargs.pop("allow_empty", None)
+        list_kwargs = {
+            "child": cls(*args, **kwargs)
+        }
+        if allow_empty is not None:
+            list_kwargs["allow_empty"] = allow_empty
+        list_kwargs.update(dict((key, value) for key, value in kwargs.items() if key in LIST_SERIALIZER_KWARGS))
+        return HaystackObjectListSerializer(*args, **list_kwargs)
+
+    def get_object_queryset(self, model):
+        """
+        Returns the queryset used for loading objects of `model` in bulk.
+
+        A queryset for the model may be declared in the ``object_querysets``
+        dictionary on the Meta class (ie. to add ``select_related()`` calls).
+        Otherwise we'll use the `read_queryset()` of the model's search index,
+        just like `SearchResult.object` does. If Meta sets
+        ``restrict_object_fields = True``, the queryset is restricted to the
+        model fields used by this serializer, unless it uses ``select_related()``
+        (which can't follow a deferred relation).
+        """
+        meta = getattr(self, "Meta", None)
+        object_querysets = getattr(meta, "object_querysets", {})
+        if model in object_querysets:
+            return object_querysets[model].all()
+
+        try:
+            index = connections[DEFAULT_ALIAS].get_unified_index().get_index(model)
+            queryset = index.read_queryset()
+        except NotHandled:
+            queryset = model._default_manager.all()
+
+        if getattr(meta, "restrict_object_fields", False) and model is getattr(meta, "model", None) \
+                and not queryset.query.select_related:
+            only_fields = self.get_object_only_fields(model)
+            if only_fields:
+                queryset = queryset.only(*only_fields)
+        return queryset
+
+    def get_object_only_fields(self, model):
+        """
+        Returns the names of the model fields read by this serializer, or
+        ``None`` if it reads anything else than concrete model fields (such
+        as method fields, properties or reverse relations), in which case we
+        can't tell which fields are safe to leave out.
+        """
+        model_fields = {}
+        for field in model._meta.fields:
+            model_fields[field.name] = field.name
+            model_fields[field.attname] = field.name
+
+        only_fields = set([model._meta.pk.name])
+        for field in six.itervalues(self.fields):
+            if field.write_only:
+                continue
+            if not field.source_attrs or field.source_attrs[0] not in model_fields:
+                return None
+            only_fields.add(model_fields[field.source_attrs[0]])
+        return sorted(only_fields)
+
     def to_representation(self, instance):
         obj = instance.object
         return super(HaystackSerializerMixin, self).to_representation(obj)
@@ -213,6 +539,7 @@ class HighlighterMixin(object):
     highlighter_html_tag = "span"
     highlighter_max_length = 200
     highlighter_field = None
+    highlighter_cache = None
 
     def get_highlighter(self):
         if not self.highlighter_class:
@@ -223,26 +550,126 @@ class HighlighterMixin(object):
             )
         return self.highlighter_class
 
-    @staticmethod
-    def get_document_field(instance):
+    # Document field names, keyed by model. See `get_document_field()`.
+    _document_fields = {}
+
+    @classmethod
+    def get_document_field(cls, instance):
         """
         Returns which field the search index has marked as it's
-        `document=True` field.
+        `document=True` field. The result is memoized per model,
+        as each model has exactly one search index.
+        """
+        try:
+            return HighlighterMixin._document_fields[instance.model]
+        except KeyError:
+            document_field = None
+            for name, field in instance.searchindex.fields.items():
+                if field.document is True:
+                    document_field = name
+                    break
+            HighlighterMixin._document_fields[instance.model] = document_field
+            return document_field
+
+    def get_highlight_terms(self, request):
         """
-        for name, field in instance.searchindex.fields.items():
-            if field.document is True:
-                return name
+        Returns the search terms to highlight for `request`.
+
+        Only query parameters which map to a field on the search indexes (or the
+        ``fields`` and ``search_fields`` on the Meta class) are used, so that
+        ie. pagination and boost parameters do not end up highlighted.
+        Negated terms are left out as well.
+        """
+        meta = getattr(self, "Meta", None)
+        aliases = getattr(meta, "field_aliases", {})
+        negation_keyword = getattr(settings, "DRF_HAYSTACK_NEGATION_KEYWORD", "not")
+        lookup_sep = getattr(self.context.get("view"), "lookup_sep", ",")
+
+        field_names = set(getattr(meta, "fields", []))
+        field_names.update(getattr(meta, "search_fields", []))
+        for index_cls in chain(getattr(meta, "index_classes", []), getattr(meta, "serializers", {})):
+            field_names.update(index_cls.fields)
+
+        terms = []
+        for param, value in six.iteritems(request.GET):
+            param_parts = param.split("__")
+            base_param = aliases.get(param_parts[0], param_parts[0])
+            if (field_names and base_param not in field_names) or negation_keyword in param_parts[1:]:
+                continue
+            terms.extend(token.strip() for token in value.split(lookup_sep))
+        return " ".join(term for term in terms if term)
+
+    def get_request_highlighter(self):
+        """
+        Returns a highlighter instance for the current request, or ``None``
+        if there is nothing to highlight. The search terms are extracted and
+        the highlighter is instantiated once per request, and then reused
+        for every result.
+        """
+        request = self.context["request"]
+        highlighter_request, highlighter = getattr(self, "_request_highlighter", (None, None))
+        if highlighter_request is not request:
+            highlighter = None
+            terms = self.get_highlight_terms(request)
+            if terms:
+                highlighter = self.get_highlighter()(terms, **{
+                    "html_tag": self.highlighter_html_tag,
+                    "css_class": self.highlighter_css_class,
+                    "max_length": self.highlighter_max_length
+                })
+            self._request_highlighter = (request, highlighter)
+        return highlighter
+
+    def get_highlighter_cache(self):
+        """
+        Returns the cache used for storing highlighted snippets, or ``None``
+        if snippets should not be cached. Any object with a ``get(key)`` and
+        ``set(key, value)`` method will do, such as the
+        ``drf_haystack.utils.LRUCache`` or ``drf_haystack.utils.DjangoCache``.
+        """
+        return self.highlighter_cache
+
+    def get_snippet_cache_key(self, instance, field, highlighter):
+        """
+        Returns the key for the highlighted snippet of `field` on `instance`.
+        The key is made from the model and primary key of the document (as
+        the backend may not store an ``id`` field), the normalized search terms
+        and the settings of the highlighter.
+        """
+        return (
+            instance.app_label, instance.model_name, force_text(instance.pk), field,
+            " ".join(sorted(highlighter.query_words)), highlighter.__class__.__name__,
+            highlighter.html_tag, highlighter.css_class, highlighter.max_length
+        )
+
+    def get_highlighted_snippet(self, highlighter, instance, field):
+        """
+        Returns the highlighted snippet of `field` on `instance`, from the
+        highlighter cache if possible.
+        """
+        cache = self.get_highlighter_cache()
+        if cache is None:
+            return highlighter.highlight(getattr(instance, field))
+
+        key = self.get_snippet_cache_key(instance, field, highlighter)
+        snippet = cache.get(key)
+        if snippet is None:
+            snippet = highlighter.highlight(getattr(instance, field))
+            cache.set(key, snippet)
+        return snippet
 
     def to_representation(self, instance):
         ret = super(HighlighterMixin, self).to_representation(instance)
-        terms = " ".join(six.itervalues(self.context["request"].GET))
-        if terms:
-            highlighter = self.get_highlighter()(terms, **{
-                "html_tag": self.highlighter_html_tag,
-                "css_class": self.highlighter_css_class,
-                "max_length": self.highlighter_max_length
-            })
+        highlighter = self.get_request_highlighter()
+        if highlighter:
             document_field = self.get_document_field(instance)
-            if highlighter and document_field:
-                ret["highlighted"] = highlighter.highlight(getattr(instance, self.highlighter_field or document_field))
+            if document_field and isinstance(self.highlighter_field, (list, tuple)):
+                ret["highlighted"] = dict(
+                    (field, self.get_highlighted_snippet(highlighter, instance, field))
+                    for field in self.highlighter_field if getattr(instance, field, None) is not None
+                )
+            elif document_field:
+                ret["highlighted"] = self.get_highlighted_snippet(
+                    highlighter, instance, self.highlighter_field or document_field
+                )
         return ret
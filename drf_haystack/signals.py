@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, unicode_literals
+
+from haystack.signals import RealtimeSignalProcessor
+
+from .cache import bump_generation
+
+
+class GenerationSignalProcessorMixin(object):
+    """
+    A mixin for haystack signal processors, which bumps the generation
+    counter of an indexed model whenever an instance is saved or deleted,
+    invalidating the search results cached by the views.
+    See `HaystackGenericAPIView.result_cache_timeout`.
+    """
+
+    # The Django cache holding the generation counters. Must be the
+    # same cache as the `result_cache_alias` of your views.
+    generation_cache_alias = "default"
+
+    def handle_save(self, sender, instance, **kwargs):
+        super(GenerationSignalProcessorMixin, self).handle_save(sender, instance, **kwargs)
+        self.bump_generation(sender, instance)
+
+    def handle_delete(self, sender, instance, **kwargs):
+        super(GenerationSignalProcessorMixin, self).handle_delete(sender, instance, **kwargs)
+        self.bump_generation(sender, instance)
+
+    def bump_generation(self, sender, instance):
+        for using in self.connection_router.for_write(instance=instance):
+            if sender in self.connections[using].get_unified_index().get_indexed_models():
+                bump_generation(sender, self.generation_cache_alias)
+                break
+
+
+class RealtimeGenerationSignalProcessor(GenerationSignalProcessorMixin, RealtimeSignalProcessor):
+    """
+    Updates the search index, and invalidates the cached search results,
+    whenever an indexed model is saved or deleted.
+    """
+    pass
@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, unicode_literals
+
+import bisect
+import heapq
+import re
+import threading
+import time
+
+from django.utils.encoding import force_text
+
+from haystack import connections
+from haystack.constants import DEFAULT_ALIAS, DJANGO_ID
+from haystack.models import SearchResult
+from haystack.query import SearchQuerySet
+
+from .cache import get_generations, refreshes
+from .utils import iter_keyset_chunks
+
+WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def split_words(text):
+    """
+    Returns the lower cased words in `text`.
+    """
+    return WORD_RE.findall(force_text(text).lower())
+
+
+class SuggestionIndex(object):
+    """
+    An in-process prefix index over the `field` (usually an ``EdgeNgramField``)
+    of every document indexed for `models`, which answers autocomplete queries
+    without querying the search backend.
+
+    The words of every document are kept in a sorted array, so the documents
+    with a word starting with a prefix are found by bisection. The top
+    `max_results` documents for every prefix of up to `precompute_length`
+    characters are computed up front, as these are the most frequent and
+    least selective queries. Only the identifiers of the documents and the
+    values of `field` and of the extra stored `fields` are kept in memory.
+
+    Like the ngrams the haystack Elasticsearch backend indexes, only words
+    of `min_gram` to `max_gram` characters are matched. Queries with other
+    words are left to the backend (see `is_searchable()`).
+
+    The index is rebuilt from the backend after `refresh_interval` seconds,
+    or when the generation counters for `models` in the `generation_alias`
+    cache are bumped (see `drf_haystack.signals`). The counters are checked
+    at most every `check_interval` seconds. Set `generation_alias` to ``None``
+    in order to only refresh periodically. Once built, the index is rebuilt
+    in the background, and keeps answering queries until the new index is
+    swapped in.
+
+    The documents of every model are loaded `batch_size` at a time, ordered
+    by their ``django_id`` (see `drf_haystack.utils.iter_keyset_chunks`).
+    """
+
+    def __init__(self, models=None, field="autocomplete", fields=None, using=None, max_results=100,
+                 precompute_length=2, refresh_interval=300, check_interval=10, generation_alias="default",
+                 batch_size=1000, min_gram=2, max_gram=15):
+        self.models = list(models or [])
+        self.field = field
+        self.fields = list(fields or [])
+        self.using = using
+        self.max_results = max_results
+        self.precompute_length = precompute_length
+        self.refresh_interval = refresh_interval
+        self.check_interval = check_interval
+        self.generation_alias = generation_alias
+        self.batch_size = batch_size
+        self.min_gram = min_gram
+        self.max_gram = max_gram
+
+        self._lock = threading.Lock()
+        self._built = None
+        self._generations = None
+        self._checked = None
+        self._changed = False
+        # The stored fields, the ranked documents as ``(app_label, model_name,
+        # pk, values)`` tuples, the sorted words with the positions of their documents,
+        # and the top positions by prefix.
+        self._state = ([], [], [], [], {})
+
+    def get_models(self):
+        """
+        Returns the models to index, which are all the indexed models
+        unless `models` is set.
+        """
+        if self.models:
+            return self.models
+        return self.get_indexed_models()
+
+    def get_indexed_models(self):
+        return connections[self.using or DEFAULT_ALIAS].get_unified_index().get_indexed_models()
+
+    def holds_models(self, models):
+        """
+        Returns True if the index holds the documents of exactly `models`,
+        or of every indexed model if `models` is empty.
+        """
+        return set(self.get_models()) == set(models or self.get_indexed_models())
+
+    def get_queryset(self, model):
+        """
+        Returns the queryset of the documents of `model` to index.
+        """
+        return SearchQuerySet(using=self.using).models(model)
+
+    def get_score(self, result):
+        """
+        Returns the score of a document, which ranks the suggestions.
+        By default, the documents are ranked in the order they are loaded.
+        """
+        return 0
+
+    def get_generations(self):
+        if self.generation_alias is None:
+            return None
+        return get_generations(self.get_models(), self.generation_alias)
+
+    def is_stale(self):
+        if self._built is None:
+            return True
+        now = time.time()
+        if self.refresh_interval is not None and self._built + self.refresh_interval <= now:
+            return True
+        if not self._changed and (self._checked is None or self._checked + self.check_interval <= now):
+            self._changed = self.get_generations() != self._generations
+            self._checked = now
+        return self._changed
+
+    def refresh(self, force=False, wait=True):
+        """
+        Rebuilds the index if it is stale, or if `force` is True. Unless
+        `wait` is True, an index which has already been built is rebuilt
+        in the background.
+        """
+        if not force and not self.is_stale():
+            return
+        if not wait and self._built is not None:
+            refreshes.submit(("suggestions", id(self)), lambda: self.refresh(force))
+            return
+        with self._lock:
+            if force or self.is_stale():
+                self.build()
+
+    def build(self):
+        """
+        Loads the documents from the backend and rebuilds the index.
+        """
+        generations = self.get_generations()
+        fields = [self.field] + [field for field in self.fields if field != self.field]
+        documents, scores = [], []
+        for model in self.get_models():
+            for chunk in iter_keyset_chunks(self.get_queryset(model), DJANGO_ID, self.batch_size):
+                for result in chunk:
+                    values = tuple(getattr(result, field, None) for field in fields)
+                    documents.append((result.app_label, result.model_name, result.pk, values))
+                    scores.append(self.get_score(result))
+
+        # Rank the documents once, so the positions in `documents` are the ranks.
+        order = sorted(range(len(documents)), key=lambda position: -scores[position])
+        documents = [documents[position] for position in order]
+
+        entries = set()
+        for position, document in enumerate(documents):
+            for word in split_words(document[3][0] or ""):
+                entries.add((word, position))
+        entries = sorted(entries)
+
+        words = [word for word, _ in entries]
+        positions = [position for _, position in entries]
+
+        top = {}
+        for word, position in entries:
+            for length in range(self.min_gram, min(len(word), self.precompute_length) + 1):
+                top.setdefault(word[:length], set()).add(position)
+        top = dict((prefix, heapq.nsmallest(self.max_results, ranks)) for prefix, ranks in top.items())
+
+        # Swap in the new index at once, as it may be searched meanwhile.
+        self._state = (fields, documents, words, positions, top)
+        self._generations = generations
+        self._built = self._checked = time.time()
+        self._changed = False
+
+    @staticmethod
+    def match(words, documents, prefix):
+        """
+        Returns the set of positions of the `documents` with a word in
+        `words` starting with `prefix`.
+        """
+        positions = set()
+        index = bisect.bisect_left(words, prefix)
+        while index < len(words) and words[index].startswith(prefix):
+            positions.add(documents[index])
+            index += 1
+        return positions
+
+    def is_searchable(self, query):
+        """
+        Returns True if every word in `query` is `min_gram` to `max_gram`
+        characters long, so the index matches the same documents as the
+        search backend.
+        """
+        words = split_words(query)
+        return bool(words) and all(self.min_gram <= len(word) <= self.max_gram for word in words)
+
+    def search(self, query):
+        """
+        Returns the top ``max_results`` documents with a word starting with
+        every word in `query`, as new ``SearchResult`` instances holding the
+        indexed `field` and the stored `fields`. Returns an empty list unless
+        the query `is_searchable()`.
+        """
+        if not self.is_searchable(query):
+            return []
+        self.refresh(wait=False)
+        prefixes = sorted(set(split_words(query)), key=len, reverse=True)
+
+        fields, documents, words, positions, top = self._state
+        if len(prefixes) == 1 and prefixes[0] in top:
+            ranks = top[prefixes[0]]
+        else:
+            # Start with the longest, and presumably most selective, prefix.
+            matches = self.match(words, positions, prefixes[0])
+            for prefix in prefixes[1:]:
+                if not matches:
+                    break
+                matches &= self.match(words, positions, prefix)
+            ranks = heapq.nsmallest(self.max_results, matches)
+        return [self.make_result(fields, documents[rank]) for rank in ranks]
+
+    @staticmethod
+    def make_result(fields, document):
+        app_label, model_name, pk, values = document
+        return SearchResult(app_label, model_name, pk, 0, **dict(zip(fields, values)))
@@ -0,0 +1,248 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, unicode_literals
+
+import hashlib
+import threading
+import time
+
+from django.utils.encoding import force_text
+
+from haystack.constants import DJANGO_ID
+from rest_framework.compat import OrderedDict
+
+try:
+    from django.core.cache import caches
+
+    def get_cache(alias):
+        return caches[alias]
+except ImportError:  # Django < 1.7
+    from django.core.cache import get_cache
+
+
+class CacheStatsMixin(object):
+    """
+    Keeps track of hits and misses for a cache.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.RLock()
+
+    def record(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def stats(self):
+        """
+        Returns a dictionary with the number of hits and misses
+        and the hit ratio of the cache.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "ratio": float(self.hits) / lookups if lookups else 0.0
+        }
+
+
+class LRUCache(CacheStatsMixin):
+    """
+    A thread safe, in-process cache holding at most `maxsize` items.
+    The least recently used item is evicted when the cache is full.
+    Items are expired after `timeout` seconds, unless `timeout` is ``None``.
+
+    The interface is a subset of the Django cache API, so an ``LRUCache``
+    and a ``DjangoCache`` may be used interchangeably.
+    """
+
+    def __init__(self, maxsize=1024, timeout=None):
+        super(LRUCache, self).__init__()
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self._data = OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return self.get(key, record=False) is not None
+
+    def get(self, key, default=None, record=True):
+        with self._lock:
+            try:
+                value, expires = self._data.pop(key)
+            except KeyError:
+                if record:
+                    self.record(False)
+                return default
+            if expires is not None and expires <= time.time():
+                if record:
+                    self.record(False)
+                return default
+            # Re-insert the item, which makes it the most recently used.
+            self._data[key] = (value, expires)
+            if record:
+                self.record(True)
+            return value
+
+    def set(self, key, value, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        expires = time.time() + timeout if timeout is not None else None
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = (value, expires)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        ret = super(LRUCache, self).stats()
+        ret.update({"size": len(self._data), "maxsize": self.maxsize})
+        return ret
+
+
+class DjangoCache(CacheStatsMixin):
+    """
+    Stores items in one of the caches configured in the Django ``CACHES``
+    setting, so that they can be shared between processes. Keys may be any
+    tuple of values, and are hashed in order to fit into any cache backend.
+    The hit and miss counters are kept per process.
+    """
+
+    def __init__(self, alias="default", timeout=None, key_prefix="drf_haystack"):
+        super(DjangoCache, self).__init__()
+        self.alias = alias
+        self.timeout = timeout
+        self.key_prefix = key_prefix
+
+    @property
+    def cache(self):
+        return get_cache(self.alias)
+
+    def make_key(self, key):
+        if isinstance(key, (list, tuple)):
+            key = "\x1f".join(force_text(part) for part in key)
+        return "%s:%s" % (self.key_prefix, hashlib.md5(force_text(key).encode("utf-8")).hexdigest())
+
+    def get(self, key, default=None):
+        value = self.cache.get(self.make_key(key))
+        self.record(value is not None)
+        return default if value is None else value
+
+    def set(self, key, value, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        if timeout is None:
+            # Use the default timeout of the cache backend.
+            self.cache.set(self.make_key(key), value)
+        else:
+            self.cache.set(self.make_key(key), value, timeout)
+
+    def delete(self, key):
+        self.cache.delete(self.make_key(key))
+
+
+class LazySearchSlice(object):
+    """
+    A lazy slice of a ``SearchQuerySet``, which fetches the results from
+    the backend in chunks of `chunk_size` results while iterating. Every
+    chunk is fetched through a fresh clone of the queryset, so results
+    which have been iterated over are not kept in memory.
+
+    Slicing a ``LazySearchSlice`` returns another ``LazySearchSlice``,
+    which makes it usable as the ``object_list`` of a Django paginator.
+    """
+
+    def __init__(self, queryset, start=0, stop=None, chunk_size=100):
+        self.queryset = queryset
+        self.start = start
+        self.stop = stop
+        self.chunk_size = chunk_size
+
+    def count(self):
+        """
+        Returns the number of results in the slice.
+        """
+        count = max(self.queryset.count() - self.start, 0)
+        if self.stop is not None:
+            count = min(count, max(self.stop - self.start, 0))
+        return count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            if key.step is not None or (key.start or 0) < 0 or (key.stop or 0) < 0:
+                raise ValueError("LazySearchSlice only supports positive slices without a step.")
+            start = self.start + (key.start or 0)
+            stop = self.stop
+            if key.stop is not None:
+                stop = self.start + key.stop if stop is None else min(stop, self.start + key.stop)
+            return self.__class__(self.queryset, start, stop, self.chunk_size)
+
+        if key < 0 or (self.stop is not None and self.start + key >= self.stop):
+            raise IndexError("LazySearchSlice index out of range.")
+        return self.queryset._clone()[self.start + key]
+
+    def __iter__(self):
+        for chunk in self.chunks():
+            for result in chunk:
+                yield result
+
+    def chunks(self):
+        """
+        Yields the results of the slice as lists of at most `chunk_size` results.
+        """
+        stop = self.start + self.count()
+        for start in range(self.start, stop, self.chunk_size):
+            chunk = self.queryset._clone()[start:min(start + self.chunk_size, stop)]
+            if not chunk:
+                break
+            yield chunk
+
+
+def iter_keyset_chunks(queryset, uid_field, chunk_size=100, max_results=None):
+    """
+    Yields the results of `queryset` as lists of at most `chunk_size`
+    results, up to `max_results` results in total unless it is None.
+
+    Rather than slicing with an increasing offset, which gets slower for
+    every chunk with most backends and fails past their result window, the
+    results are ordered by `uid_field` and every chunk starts after the
+    last document of the previous chunk (keyset pagination). `uid_field`
+    must hold a unique, sortable and not analyzed value for every document.
+    """
+    queryset = queryset.order_by(uid_field)
+
+    count, last_uid = 0, None
+    while max_results is None or count < max_results:
+        size = chunk_size
+        if max_results is not None:
+            size = min(size, max_results - count)
+
+        if last_uid is None:
+            chunk = queryset._clone()[:size]
+        else:
+            chunk = queryset.filter(**{"%s__gt" % uid_field: last_uid})[:size]
+        if not chunk:
+            break
+
+        yield chunk
+        count += len(chunk)
+        if len(chunk) < size:
+            break
+        # The django_id of the documents is exposed as the pk of the results.
+        last_uid = chunk[-1].pk if uid_field == DJANGO_ID else getattr(chunk[-1], uid_field)
@@ -2,12 +2,26 @@
 
 from __future__ import absolute_import, unicode_literals
 
-from rest_framework.decorators import detail_route
+import json
+import uuid
+
+from django.core.exceptions import ImproperlyConfigured
+from django.http import StreamingHttpResponse
+from django.utils.encoding import force_bytes
+
+from haystack import connections
+from haystack.constants import DEFAULT_ALIAS, ID
+from haystack.fields import FacetField
+
+from rest_framework.decorators import detail_route, list_route
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils import encoders
 from rest_framework.viewsets import ViewSetMixin
 from rest_framework.mixins import ListModelMixin, RetrieveModelMixin
 
 from .generics import HaystackGenericAPIView
+from .utils import LazySearchSlice, iter_keyset_chunks
 
 
 class HaystackViewSet(RetrieveModelMixin, ListModelMixin, ViewSetMixin, HaystackGenericAPIView):
@@ -16,6 +30,82 @@ class HaystackViewSet(RetrieveModelMixin, ListModelMixin, ViewSetMixin, Haystack
     `retrieve()` actions with a haystack index as it's data source.
     """
 
+    # Set `streaming_list` to True in order to stream JSON encoded
+    # `list()` responses, fetching and serializing `streaming_chunk_size`
+    # results at a time.
+    streaming_list = False
+    streaming_chunk_size = 100
+
+    def list(self, request, *args, **kwargs):
+        if self.streaming_list and getattr(request.accepted_renderer, "format", None) == "json":
+            return self.streaming_list_response(request)
+        return super(HaystackViewSet, self).list(request, *args, **kwargs)
+
+    def streaming_list_response(self, request):
+        """
+        Returns a `StreamingHttpResponse` with the JSON encoded results.
+
+        The results are fetched from the backend and serialized in chunks,
+        so memory usage is bounded by ``streaming_chunk_size`` rather than by
+        the page size. If the view is paginated, the results are wrapped in
+        the paginated response, which is rendered around them. Paginators with
+        a ``paginate_lazy_queryset()`` method (such as the
+        `HaystackPageNumberPagination`) let the page be fetched in chunks too,
+        while other paginators fetch the whole page up front.
+        """
+        queryset = LazySearchSlice(self.filter_queryset(self.get_queryset()), chunk_size=self.streaming_chunk_size)
+
+        prefix, suffix = "", ""
+        paginate_lazy_queryset = getattr(self.paginator, "paginate_lazy_queryset", None)
+        if paginate_lazy_queryset is not None:
+            page = paginate_lazy_queryset(queryset, self.request, view=self)
+        else:
+            page = self.paginate_queryset(queryset)
+        if page is not None:
+            # Render the paginated response around a placeholder, and
+            # stream the results in its place.
+            placeholder = uuid.uuid4().hex
+            envelope = self.json_dumps(self.get_paginated_response(placeholder).data)
+            prefix, suffix = envelope.split(self.json_dumps(placeholder), 1)
+            queryset = page
+
+        return StreamingHttpResponse(self.iter_json(queryset, prefix, suffix), content_type="application/json")
+
+    def iter_json(self, results, prefix="", suffix=""):
+        """
+        Yields `results` as a JSON encoded list between `prefix` and `suffix`,
+        one chunk of serialized results at a time.
+        """
+        yield force_bytes("%s[" % prefix)
+        separator = ""
+        for chunk in self.iter_chunks(results):
+            data = self.get_serializer(chunk, many=True).data
+            if data:
+                yield force_bytes(separator + ",".join(self.json_dumps(item) for item in data))
+                separator = ","
+        yield force_bytes("]%s" % suffix)
+
+    def iter_chunks(self, results):
+        """
+        Yields `results` as lists of at most ``streaming_chunk_size`` results.
+        """
+        if isinstance(results, LazySearchSlice):
+            for chunk in results.chunks():
+                yield chunk
+        else:
+            results = list(results)
+            for start in range(0, len(results), self.streaming_chunk_size):
+                yield results[start:start + self.streaming_chunk_size]
+
+    def json_dumps(self, data):
+        """
+        Encodes `data` the same way as the REST Framework `JSONRenderer`.
+        """
+        separators = (",", ":") if getattr(api_settings, "COMPACT_JSON", False) else (", ", ": ")
+        return json.dumps(
+            data, cls=encoders.JSONEncoder, ensure_ascii=not api_settings.UNICODE_JSON, separators=separators
+        )
+
     @detail_route(methods=["get"], url_path="more-like-this")
     def more_like_this(self, request, pk=None):
         """
@@ -34,3 +124,90 @@ class HaystackViewSet(RetrieveModelMixin, ListModelMixin, ViewSetMixin, Haystack
 
         serializer = self.get_serializer(mlt_queryset, many=True)
         return Response(serializer.data)
+
+
+class HaystackExportMixin(object):
+    """
+    Adds an `export` list route to a `HaystackViewSet`, which streams every
+    result matching the filters as newline delimited JSON. Mix it in before
+    the `HaystackViewSet`, and set the `export_uid_field`.
+    """
+
+    # The `export` action fetches `export_batch_size` results at a time,
+    # and stops after `export_max_rows` results unless it is None. Set
+    # `export_uid_field` to a unique, sortable and non-analyzed index field.
+    # See `get_export_uid_field()`.
+    export_batch_size = 1000
+    export_max_rows = 10000
+    export_uid_field = None
+
+    @list_route(methods=["get"])
+    def export(self, request):
+        """
+        Sets up a list route which streams every result matching the filters
+        as newline delimited JSON, one serialized result per line.
+
+        This will add ie. ^search/export/$ to your existing ^search pattern.
+        """
+        # Fail before the response is streamed if the view isn't set up for exports.
+        self.get_export_uid_field()
+        queryset = self.filter_queryset(self.get_queryset())
+        return StreamingHttpResponse(self.iter_ndjson(queryset), content_type="application/x-ndjson")
+
+    def iter_ndjson(self, queryset):
+        """
+        Yields the serialized results of `queryset` as newline delimited
+        JSON, one batch of results at a time.
+        """
+        for batch in self.iter_export_batches(queryset):
+            data = self.get_serializer(batch, many=True).data
+            if data:
+                yield force_bytes("".join("%s\n" % self.json_dumps(item) for item in data))
+
+    def iter_export_batches(self, queryset):
+        """
+        Yields the results of `queryset` in batches of ``export_batch_size``
+        results, up to ``export_max_rows`` results in total.
+
+        Rather than slicing with an increasing offset, which gets slower for
+        every page with most backends, the results are ordered by the
+        ``export_uid_field`` and every batch starts after the last document
+        of the previous batch (keyset pagination).
+        """
+        return iter_keyset_chunks(
+            queryset, self.get_export_uid_field(), self.export_batch_size, self.export_max_rows
+        )
+
+    def get_export_uid_field(self):
+        """
+        Returns the ``export_uid_field``, which the exported results are
+        ordered and paged by. It must hold a unique value for every document,
+        and be sortable and support range lookups in the search backend.
+
+        Raises ``ImproperlyConfigured`` if it isn't set, or if it's a text
+        field which the search backend analyzes (unless it's a faceted field
+        or isn't indexed), as analyzed fields can't be reliably sorted. This
+        includes the haystack ``id`` field, but not the ``django_id`` field.
+        """
+        uid_field = self.export_uid_field
+        if uid_field is None:
+            raise ImproperlyConfigured(
+                "%s.export_uid_field must be set to a unique, sortable and not analyzed search index field "
+                "in order to export the results." % self.__class__.__name__
+            )
+        if uid_field == ID:
+            raise ImproperlyConfigured(
+                "%s.export_uid_field '%s' is analyzed by the search backend, and can't be reliably sorted. "
+                "Use the 'django_id' field or a faceted field instead." % (self.__class__.__name__, uid_field)
+            )
+
+        unified_index = connections[DEFAULT_ALIAS].get_unified_index()
+        for model in self.index_models or unified_index.get_indexed_models():
+            field = unified_index.get_index(model).fields.get(uid_field)
+            if field is not None and field.field_type == "string" and field.indexed \
+                    and not isinstance(field, FacetField):
+                raise ImproperlyConfigured(
+                    "%s.export_uid_field '%s' is an analyzed text field, which can't be reliably sorted. "
+                    "Use a faceted field instead." % (self.__class__.__name__, uid_field)
+                )
+        return uid_field
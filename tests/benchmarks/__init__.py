@@ -0,0 +1,7 @@
+# -*- coding: utf-8 -*-
+#
+# Micro benchmarks for drf-haystack. These are not run by the test suite,
+# run them as modules from the project root, ie.
+#
+#   $ python -m tests.benchmarks.highlighting
+#
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+#
+# Benchmarks the `drf_haystack.highlighting.CompiledHighlighter` against
+# the stock haystack `Highlighter` on multi-KB documents.
+#
+
+from __future__ import absolute_import, print_function, unicode_literals
+
+import random
+import timeit
+
+from haystack.utils import Highlighter
+
+from drf_haystack.highlighting import CompiledHighlighter
+
+WORDS = [
+    "search", "index", "document", "haystack", "django", "rest", "framework", "query",
+    "serializer", "filter", "backend", "elastic", "result", "highlight", "field", "model",
+    "view", "router", "response", "request", "python", "nice", "chap", "jeremy", "fowler",
+]
+
+QUERIES = ["jeremy", "jeremy fowler nice", "search index document query result highlight"]
+
+
+def make_document(size, seed=42):
+    rnd = random.Random(seed)
+    words = []
+    length = 0
+    while length < size:
+        word = rnd.choice(WORDS)
+        words.append(word)
+        length += len(word) + 1
+    return " ".join(words)
+
+
+def run(number=200):
+    print("%-10s %-50s %14s %14s %8s" % ("doc size", "query", "stock (ms)", "compiled (ms)", "speedup"))
+    for size in (2 * 1024, 16 * 1024, 64 * 1024):
+        document = make_document(size)
+        for query in QUERIES:
+            stock = Highlighter(query)
+            compiled = CompiledHighlighter(query)
+            stock_time = timeit.timeit(lambda: stock.highlight(document), number=number) / number
+            compiled_time = timeit.timeit(lambda: compiled.highlight(document), number=number) / number
+            print("%-10s %-50s %14.3f %14.3f %7.1fx" % (
+                "%dKB" % (size // 1024), query, stock_time * 1000, compiled_time * 1000, stock_time / compiled_time
+            ))
+
+
+if __name__ == "__main__":
+    run()
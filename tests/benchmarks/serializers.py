@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+#
+# Benchmarks the `drf_haystack.serializers.HaystackFastSerializer` against
+# the `HaystackSerializer`, by serializing in-memory search results.
+#
+
+from __future__ import absolute_import, print_function, unicode_literals
+
+import timeit
+
+from haystack.models import SearchResult
+from rest_framework import serializers
+
+from drf_haystack.serializers import HaystackFastSerializer, HaystackSerializer
+
+from ..mockapp.search_indexes import MockPersonIndex, MockPetIndex
+
+
+class PersonMeta:
+    index_classes = [MockPersonIndex]
+    fields = ["firstname", "lastname", "full_name", "description"]
+
+
+class MultipleIndexMeta:
+    index_classes = [MockPersonIndex, MockPetIndex]
+    exclude = ["text", "autocomplete"]
+
+
+class PersonSerializer(HaystackSerializer):
+    Meta = PersonMeta
+
+
+class FastPersonSerializer(HaystackFastSerializer):
+    Meta = PersonMeta
+
+
+class MultipleIndexSerializer(HaystackSerializer):
+    score = serializers.FloatField()
+    Meta = MultipleIndexMeta
+
+
+class FastMultipleIndexSerializer(HaystackFastSerializer):
+    score = serializers.FloatField()
+    Meta = MultipleIndexMeta
+
+
+def make_results(count):
+    results = []
+    for pk in range(count):
+        if pk % 2:
+            results.append(SearchResult("mockapp", "mockpet", pk, 1.0, **{
+                "name": "Pet %d" % pk, "species": "Dog", "description": "Pet %d the Dog" % pk
+            }))
+        else:
+            results.append(SearchResult("mockapp", "mockperson", pk, 1.0, **{
+                "firstname": "John", "lastname": "Doe %d" % pk, "full_name": "John Doe %d" % pk,
+                "description": "John is a nice chap!"
+            }))
+    return results
+
+
+def run(count=1000, number=20):
+    print("%-30s %16s %16s %8s" % ("serializer", "rows/sec", "fast rows/sec", "speedup"))
+    results = make_results(count)
+    person_results = [result for result in results if result.model_name == "mockperson"]
+    for name, serializer_class, fast_serializer_class, objs in (
+        ("single index", PersonSerializer, FastPersonSerializer, person_results),
+        ("multiple index + declared", MultipleIndexSerializer, FastMultipleIndexSerializer, results),
+    ):
+        regular = timeit.timeit(lambda: serializer_class(instance=objs, many=True).data, number=number)
+        fast = timeit.timeit(lambda: fast_serializer_class(instance=objs, many=True).data, number=number)
+        rows = len(objs) * number
+        print("%-30s %16d %16d %7.1fx" % (name, rows / regular, rows / fast, regular / fast))
+
+
+if __name__ == "__main__":
+    run()
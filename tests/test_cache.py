@@ -0,0 +1,316 @@
+# -*- coding: utf-8 -*-
+#
+# Unit tests for the `drf_haystack.cache` result cache.
+#
+
+from __future__ import absolute_import, unicode_literals
+
+import json
+import threading
+import time
+
+import mock
+from django.test import TestCase
+from haystack import connection_router, connections
+from haystack.query import SearchQuerySet
+from haystack.signals import BaseSignalProcessor
+from rest_framework import status
+from rest_framework.test import APIRequestFactory
+
+from drf_haystack.cache import (
+    FLIGHT_LOCK_KEY, FLIGHT_RESULTS_KEY, RefreshPool, SingleFlight, bump_generation, dump_queryset, flights,
+    get_generations, refreshes
+)
+from drf_haystack.pagination import HaystackPageNumberPagination
+from drf_haystack.serializers import HaystackSerializer
+from drf_haystack.signals import GenerationSignalProcessorMixin
+from drf_haystack.utils import LRUCache, get_cache
+from drf_haystack.viewsets import HaystackExportMixin, HaystackViewSet
+
+from .mockapp.models import MockPerson, MockPet
+from .mockapp.search_indexes import MockPersonIndex
+from .utils import count_searches
+
+factory = APIRequestFactory()
+
+
+class GenerationSignalProcessor(GenerationSignalProcessorMixin, BaseSignalProcessor):
+    pass
+
+
+class HaystackResultCacheTestCase(TestCase):
+
+    fixtures = ["mockperson"]
+
+    def setUp(self):
+        MockPersonIndex().reindex()
+        get_cache("default").clear()
+
+        class Serializer1(HaystackSerializer):
+
+            class Meta:
+                index_classes = [MockPersonIndex]
+                fields = ["firstname", "lastname"]
+
+        class Pagination(HaystackPageNumberPagination):
+            page_size = 4
+
+        class ViewSet1(HaystackViewSet):
+            index_models = [MockPerson]
+            serializer_class = Serializer1
+            pagination_class = Pagination
+            result_cache_timeout = 60
+
+        self.view1 = ViewSet1
+
+    def tearDown(self):
+        MockPersonIndex().clear()
+        get_cache("default").clear()
+
+    def get_data(self, searches, data=None):
+        with count_searches() as calls:
+            request = factory.get(path="/", data=data or {})
+            response = self.view1.as_view(actions={"get": "list"})(request)
+            response.render()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(calls), searches)
+        return json.loads(response.content.decode())
+
+    def test_result_cache(self):
+        data = self.get_data(1, {"firstname": "john", "lastname": ""})
+        self.assertEqual(self.get_data(0, {"firstname": "john"}), data)
+
+        data = self.get_data(1, {"page": 2})
+        self.assertEqual(self.get_data(0, {"page": 2}), data)
+        self.assertEqual(len(data["results"]), 4)
+
+    def test_result_cache_no_results(self):
+        data = self.get_data(1, {"firstname": "nobody"})
+        self.assertEqual(data["count"], 0)
+        self.assertEqual(self.get_data(0, {"firstname": "nobody"}), data)
+
+    def test_result_cache_invalidation(self):
+        self.get_data(1)
+        self.get_data(0)
+
+        person = MockPerson.objects.all()[0]
+        generations = get_generations([MockPerson])
+        GenerationSignalProcessor(connections, connection_router).handle_save(MockPerson, person)
+        self.assertNotEqual(get_generations([MockPerson]), generations)
+        self.get_data(1)
+        self.get_data(0)
+
+        # Other models doesn't invalidate the results.
+        bump_generation(MockPet)
+        self.get_data(0)
+
+        bump_generation()
+        self.get_data(1)
+
+    def test_result_cache_stale_while_revalidate(self):
+        self.view1.result_cache_stale_timeout = 0
+        data = self.get_data(1, {"firstname": "john"})
+        self.assertEqual(data["count"], 3)
+
+        # The person is saved without invalidating the cached results.
+        person = MockPerson.objects.get(firstname="John", lastname="McClane")
+        person.firstname = "Jack"
+        person.save()
+        MockPersonIndex().update_object(person)
+
+        # The stale results are served, and refreshed in the background.
+        with mock.patch.object(refreshes, "submit", wraps=refreshes.submit) as submit:
+            self.assertEqual(self.get_data(0, {"firstname": "john"}), data)
+            refreshes.join()
+        self.assertEqual(submit.call_count, 1)
+
+        self.view1.result_cache_stale_timeout = 60
+        self.assertEqual(self.get_data(0, {"firstname": "john"})["count"], 2)
+
+    def test_negative_result_cache(self):
+        self.view1.result_cache_timeout = None
+        self.view1.negative_result_cache = LRUCache(maxsize=2, timeout=60)
+
+        self.assertEqual(self.get_data(1, {"firstname": "nobody"})["count"], 0)
+        self.assertEqual(self.get_data(0, {"firstname": "nobody"})["count"], 0)
+        # Queries with results are not remembered.
+        self.get_data(1, {"firstname": "john"})
+        self.get_data(1, {"firstname": "john"})
+
+        bump_generation(MockPerson)
+        self.get_data(1, {"firstname": "nobody"})
+        self.get_data(0, {"firstname": "nobody"})
+
+        # The least recently used queries are evicted.
+        self.get_data(1, {"firstname": "noone"})
+        self.get_data(1, {"firstname": "nothing"})
+        self.assertEqual(len(self.view1.negative_result_cache), 2)
+        self.get_data(1, {"firstname": "nobody"})
+
+    def test_result_cache_key_computed_once(self):
+        self.view1.negative_result_cache = LRUCache(maxsize=2, timeout=60)
+        self.view1.single_flight = True
+        with mock.patch("drf_haystack.generics.get_generations", wraps=get_generations) as generations:
+            self.get_data(1, {"firstname": "john"})
+            self.assertEqual(generations.call_count, 1)
+            self.get_data(0, {"firstname": "john"})
+            self.assertEqual(generations.call_count, 2)
+
+    def test_result_cache_key_by_action(self):
+        class ViewSet(HaystackExportMixin, self.view1):
+            pass
+
+        request = factory.get(path="/", data={"firstname": "john"})
+        keys = [ViewSet(request=request, kwargs={}, action=action).get_result_cache_key()
+                for action in ("list", "export")]
+        self.assertNotEqual(keys[0], keys[1])
+
+    def test_refresh_pool(self):
+        pool = RefreshPool(workers=1, max_pending=2)
+        event, calls = threading.Event(), []
+
+        def refresh(key):
+            event.wait(1)
+            calls.append(key)
+
+        self.assertTrue(pool.submit("a", lambda: refresh("a")))
+        # A key is only refreshed once at a time, and the queue is bounded.
+        self.assertFalse(pool.submit("a", lambda: refresh("a")))
+        self.assertTrue(pool.submit("b", lambda: refresh("b")))
+        self.assertFalse(pool.submit("c", lambda: refresh("c")))
+        event.set()
+        pool.join()
+        self.assertEqual(calls, ["a", "b"])
+        self.assertTrue(pool.submit("a", lambda: refresh("a")))
+        pool.join()
+
+
+class SingleFlightTestCase(TestCase):
+
+    fixtures = ["mockperson"]
+
+    def setUp(self):
+        MockPersonIndex().reindex()
+        get_cache("default").clear()
+        self.flights = SingleFlight()
+        self.entry = {"count": 0, "segments": [], "created": 0}
+
+        class Serializer(HaystackSerializer):
+
+            class Meta:
+                index_classes = [MockPersonIndex]
+                fields = ["firstname", "lastname"]
+
+        class Pagination(HaystackPageNumberPagination):
+            page_size = 4
+
+        class ViewSet(HaystackViewSet):
+            index_models = [MockPerson]
+            serializer_class = Serializer
+            pagination_class = Pagination
+            single_flight = True
+
+        self.view = ViewSet
+
+    def tearDown(self):
+        MockPersonIndex().clear()
+        get_cache("default").clear()
+
+    def run_in_thread(self, func, *args):
+        results = []
+        thread = threading.Thread(target=lambda: results.append(func(*args)))
+        thread.start()
+        return thread, results
+
+    def test_followers_share_leader_entry(self):
+        flight, entry = self.flights.acquire("key")
+        self.assertIsNotNone(flight)
+        thread, results = self.run_in_thread(self.flights.acquire, "key")
+        time.sleep(0.1)
+        self.flights.land(flight, self.entry)
+        thread.join()
+        self.assertEqual(results, [(None, self.entry)])
+
+        # The next request searches again.
+        flight, entry = self.flights.acquire("key")
+        self.assertIsNotNone(flight)
+        self.flights.land(flight, None)
+
+    def test_followers_get_their_own_results(self):
+        queryset = SearchQuerySet().models(MockPerson).filter(firstname="John")
+        list(queryset[:10])
+
+        def get_results():
+            view = self.view()
+            view.request, view.kwargs = factory.get(path="/", data={"firstname": "John"}), {}
+            return list(view.get_single_flight_queryset(queryset._clone())[:10])
+
+        leader = self.view()
+        leader.request, leader.kwargs = factory.get(path="/", data={"firstname": "John"}), {}
+        flight, _ = flights.acquire(leader.get_result_cache_key())
+        threads = [self.run_in_thread(get_results) for _ in range(2)]
+        time.sleep(0.1)
+        flights.land(flight, dump_queryset(queryset))
+        for thread, _ in threads:
+            thread.join()
+
+        first, second = [results[0] for _, results in threads]
+        self.assertEqual([result.pk for result in first], [result.pk for result in queryset])
+        self.assertEqual([result.pk for result in second], [result.pk for result in first])
+        self.assertFalse(any(a is b for a, b in zip(first, second)))
+
+    def test_leader_filters_queryset_twice(self):
+        view = self.view()
+        view.request, view.kwargs, view.action = factory.get(path="/", data={"firstname": "John"}), {}, "list"
+        started = time.time()
+        view.filter_queryset(view.get_queryset())
+        flight, _ = view._single_flight_state
+        view.filter_queryset(view.get_queryset())
+        self.assertLess(time.time() - started, 1)
+        self.assertIs(view._single_flight_state[0], flight)
+
+        view.land_single_flight()
+        self.assertTrue(flight.landed)
+
+    def test_follower_timeout(self):
+        flight, _ = self.flights.acquire("key")
+        self.assertEqual(self.flights.acquire("key", timeout=0.05), (None, None))
+        self.flights.land(flight, None)
+
+    def test_across_processes(self):
+        cache = get_cache("default")
+        # Another process holds the lock, and publishes its results later.
+        cache.add(FLIGHT_LOCK_KEY % "key", 1, 5)
+        timer = threading.Timer(0.1, lambda: cache.set(FLIGHT_RESULTS_KEY % "key", self.entry, 5))
+        timer.start()
+        self.assertEqual(self.flights.acquire("key", alias="default", timeout=1), (None, self.entry))
+        timer.join()
+
+        # The lock is released when a flight lands.
+        cache.delete(FLIGHT_LOCK_KEY % "key")
+        flight, _ = self.flights.acquire("key", alias="default")
+        self.assertIsNotNone(cache.get(FLIGHT_LOCK_KEY % "key"))
+        self.flights.land(flight, self.entry)
+        self.assertIsNone(cache.get(FLIGHT_LOCK_KEY % "key"))
+
+    def test_concurrent_requests_search_once(self):
+        def get_data():
+            request = factory.get(path="/", data={"firstname": "John"})
+            response = self.view.as_view(actions={"get": "list"})(request)
+            response.render()
+            return json.loads(response.content.decode())
+
+        with count_searches(delay=0.3) as calls:
+            threads = []
+            for i in range(3):
+                threads.append(self.run_in_thread(get_data))
+                time.sleep(0.05)
+            for thread, _ in threads:
+                thread.join()
+
+        self.assertEqual(len(calls), 1)
+        data = [results[0] for _, results in threads]
+        self.assertEqual(data[0]["count"], 3)
+        self.assertEqual(data[1], data[0])
+        self.assertEqual(data[2], data[0])
@@ -5,27 +5,38 @@
 
 from __future__ import absolute_import, unicode_literals
 
+import datetime
 import json
+
+import mock
 from unittest2 import skipIf
 
 from django.core.exceptions import ImproperlyConfigured
 from django.test import TestCase
 
+from haystack import connections, indexes
+from haystack.query import SQ
+
 from rest_framework import status
 from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
 from rest_framework.test import APIRequestFactory
 
+from drf_haystack.pagination import HaystackPageNumberPagination
+from drf_haystack.utils import LRUCache
 from drf_haystack.viewsets import HaystackViewSet
 from drf_haystack.serializers import HaystackSerializer
 from drf_haystack.filters import (
-    HaystackAutocompleteFilter, HaystackBoostFilter,
-    HaystackGEOSpatialFilter, HaystackHighlightFilter
+    FilterSchema, HaystackAutocompleteFilter, HaystackBoostFilter,
+    HaystackFilter, HaystackGEOSpatialFilter, HaystackHighlightFilter,
+    is_contradiction, normalize_sq
 )
 
 from . import geospatial_support
 from .constants import MOCKLOCATION_DATA_SET_SIZE, MOCKPERSON_DATA_SET_SIZE
 from .mockapp.models import MockLocation, MockPerson
 from .mockapp.search_indexes import MockLocationIndex, MockPersonIndex
+from .utils import count_searches
 
 factory = APIRequestFactory()
 
@@ -185,6 +196,230 @@ class HaystackFilterTestCase(TestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data), 2)
 
+    def test_filter_unknown_lookup_is_ignored(self):
+        request = factory.get(path="/", data={"firstname__foo": "John"}, content_type="application/json")
+        response = self.view1.as_view(actions={"get": "list"})(request)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), MOCKPERSON_DATA_SET_SIZE)
+
+    def test_filter_empty_tokens_are_ignored(self):
+        request = factory.get(path="/", data={"firstname": " , "}, content_type="application/json")
+        response = self.view1.as_view(actions={"get": "list"})(request)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), MOCKPERSON_DATA_SET_SIZE)
+
+    def test_filter_schema_is_compiled_once(self):
+        view = self.view1()
+        schema = HaystackFilter.get_schema(view)
+        self.assertIs(HaystackFilter.get_schema(view), schema)
+        self.assertEqual(schema.allowed, frozenset(["text", "firstname", "lastname", "full_name", "autocomplete"]))
+        self.assertEqual(schema.aliases, {"q": "autocomplete", "name": "full_name"})
+
+        HaystackFilter.clear_schema_cache()
+        self.assertIsNot(HaystackFilter.get_schema(view), schema)
+
+    def test_filter_cache_normalizes_parameters(self):
+        HaystackFilter.clear_schema_cache()
+        view = self.view1()
+        terms, _ = HaystackFilter.build_filter(view, filters={"firstname": "John,Jack", "name__contains": "Doe"})
+        other_terms, _ = HaystackFilter.build_filter(view, filters={"full_name__contains": "Doe ", "firstname": " Jack,John,Jack"})
+
+        stats = HaystackFilter.get_schema(view).cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["size"]), (1, 1, 1))
+        self.assertEqual(repr(terms), repr(other_terms))
+
+    def test_filter_cache_returns_copies(self):
+        HaystackFilter.clear_schema_cache()
+        view = self.view1()
+        terms, _ = HaystackFilter.build_filter(view, filters={"firstname": "John"})
+        terms.add(view.query_object(lastname="McClane"), "AND")
+
+        other_terms, _ = HaystackFilter.build_filter(view, filters={"firstname": "John"})
+        self.assertIsNot(other_terms, terms)
+        self.assertEqual(other_terms.children, [("firstname", "John")])
+
+    def test_filter_exact_lookup_compacted_to_in(self):
+        view = self.view1()
+        terms, exclude_terms = HaystackFilter.build_filter(
+            view, filters={"firstname__exact": "John,Randall,John", "lastname__not__exact": "McClane"}
+        )
+        self.assertEqual(terms.children, [("firstname__in", ["John", "Randall"])])
+        self.assertEqual(exclude_terms.children, [("lastname__exact", "McClane")])
+
+        request = factory.get(path="/", data={"firstname__exact": "John,Randall"}, content_type="application/json")
+        response = self.view1.as_view(actions={"get": "list"})(request)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 5)
+
+    def test_filter_in_lookup_values(self):
+        terms, _ = HaystackFilter.build_filter(self.view1(), filters={"firstname__in": "John"})
+        self.assertEqual(terms.children, [("firstname__in", ["John"])])
+
+    def test_filter_max_in_values(self):
+
+        class Filter(HaystackFilter):
+            max_in_values = 2
+
+        self.assertRaises(
+            ValidationError, Filter.build_filter, self.view1(), filters={"firstname__exact": "John,Randall,Mark"}
+        )
+        # Values for other lookups aren't limited.
+        terms, _ = Filter.build_filter(self.view1(), filters={"firstname": "John,Randall,Mark"})
+        self.assertEqual(len(terms.children), 3)
+
+    def test_filter_cache_disabled(self):
+
+        class Filter(HaystackFilter):
+            filter_cache_size = 0
+
+        view = self.view1()
+        self.assertIsNone(Filter.get_schema(view).cache)
+        terms, _ = Filter.build_filter(view, filters={"firstname": "John"})
+        self.assertEqual(terms.children, [("firstname", "John")])
+
+
+class SQNormalizationTestCase(TestCase):
+
+    fixtures = ["mockperson"]
+
+    def setUp(self):
+        MockPersonIndex().reindex()
+
+        class Serializer(HaystackSerializer):
+
+            class Meta:
+                index_classes = [MockPersonIndex]
+                fields = ["text", "firstname", "lastname", "autocomplete"]
+
+        class ViewSet(HaystackViewSet):
+            index_models = [MockPerson]
+            serializer_class = Serializer
+
+        self.view = ViewSet
+
+    def tearDown(self):
+        MockPersonIndex().clear()
+
+    def test_normalize_flattens_and_removes_duplicates(self):
+        query = SQ(firstname="John") & (SQ(lastname="Doe") & (SQ(firstname="John") & SQ(text="nice")))
+        normalized = normalize_sq(query)
+        self.assertEqual(normalized.connector, SQ.AND)
+        self.assertEqual(normalized.children, [("firstname", "John"), ("lastname", "Doe"), ("text", "nice")])
+
+        query = SQ(firstname="John") | (SQ(firstname="Jack") | SQ(firstname="John"))
+        normalized = normalize_sq(query)
+        self.assertEqual(normalized.connector, SQ.OR)
+        self.assertEqual(normalized.children, [("firstname", "John"), ("firstname", "Jack")])
+
+    def test_normalize_keeps_nested_nodes(self):
+        query = SQ(lastname="Doe") & (SQ(firstname="John") | SQ(firstname="Jack")) & ~SQ(text="nice")
+        original = repr(query)
+        normalized = normalize_sq(query)
+        self.assertEqual(len(normalized.children), 3)
+        self.assertEqual(normalized.children[1].connector, SQ.OR)
+        self.assertTrue(normalized.children[2].negated)
+        # The original query is left untouched.
+        self.assertEqual(repr(query), original)
+
+    def test_is_contradiction(self):
+        terms = normalize_sq(SQ(firstname="John") & SQ(lastname="Doe"))
+        self.assertTrue(is_contradiction(terms, normalize_sq(SQ(firstname="John"))))
+        self.assertTrue(is_contradiction(terms, normalize_sq(SQ(lastname="Doe") & SQ(firstname="John"))))
+        self.assertTrue(is_contradiction(normalize_sq(terms & ~SQ(lastname="Doe"))))
+        self.assertFalse(is_contradiction(terms, normalize_sq(SQ(firstname="John") & SQ(text="nice"))))
+        self.assertFalse(is_contradiction(terms, normalize_sq(SQ(firstname="Jack"))))
+        self.assertFalse(is_contradiction([], normalize_sq(SQ(firstname="John"))))
+
+    def test_filter_contradiction_skips_backend(self):
+        request = factory.get(path="/", data={"firstname": "John", "firstname__not": "John"},
+                              content_type="application/json")
+        with count_searches() as calls:
+            response = self.view.as_view(actions={"get": "list"})(request)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 0)
+        self.assertEqual(len(calls), 0)
+
+    def test_autocomplete_duplicate_words(self):
+        view = self.view()
+        queryset = view.get_queryset()
+        request = factory.get(path="/", data={"autocomplete": "jer jer"}, content_type="application/json")
+        self.view.filter_backends = [HaystackAutocompleteFilter]
+        try:
+            response = self.view.as_view(actions={"get": "list"})(request)
+        finally:
+            del self.view.filter_backends
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        terms = HaystackAutocompleteFilter()._construct_query(SQ(autocomplete="jer jer"), queryset, view)
+        self.assertEqual(len(normalize_sq(terms).children), 1)
+
+
+class FilterSchemaTestCase(TestCase):
+
+    def setUp(self):
+
+        class TypedIndex(indexes.SearchIndex):
+            text = indexes.CharField(document=True)
+            age = indexes.IntegerField()
+            score = indexes.FloatField()
+            alive = indexes.BooleanField()
+            born = indexes.DateField()
+
+        class Serializer(HaystackSerializer):
+
+            class Meta:
+                index_classes = [TypedIndex]
+                exclude = ["score"]
+                field_aliases = {"years": "age"}
+
+        class ViewSet(HaystackViewSet):
+            index_models = [MockPerson]
+            serializer_class = Serializer
+
+        self.schema = FilterSchema(Serializer)
+        self.view = ViewSet
+
+    def test_schema_parse(self):
+        self.assertEqual(self.schema.parse("text"), ("text", None, False))
+        self.assertEqual(self.schema.parse("text__not__startswith"), ("text__startswith", None, True))
+        self.assertEqual(self.schema.parse("years__gte"), ("age__gte", int, False))
+        self.assertEqual(self.schema.parse("age__contains"), ("age__contains", None, False))
+
+    def test_schema_parse_ignored_params(self):
+        self.assertIsNone(self.schema.parse("score"))
+        self.assertIsNone(self.schema.parse("text__foo"))
+        self.assertIsNone(self.schema.parse("text__exact__gte"))
+
+    def test_schema_coercers(self):
+        self.assertEqual(self.schema.parse("alive")[1]("Yes"), True)
+        self.assertEqual(self.schema.parse("alive")[1]("0"), False)
+        self.assertEqual(self.schema.parse("born__lt")[1]("2015-06-01"), datetime.date(2015, 6, 1))
+        self.assertRaises(ValueError, self.schema.parse("alive")[1], "maybe")
+        self.assertRaises(ValueError, self.schema.parse("born")[1], "yesterday")
+
+    def test_filter_invalid_typed_value(self):
+        request = factory.get(path="/", data={"age__gte": "ten"}, content_type="application/json")
+        response = self.view.as_view(actions={"get": "list"})(request)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("age__gte", response.data)
+
+    def test_build_filter_coerces_values(self):
+        terms, exclude_terms = HaystackFilter.build_filter(self.view(), filters={"years": "20,10", "alive__not": "no"})
+        self.assertEqual(terms.children, [("age__in", [10, 20])])
+        self.assertEqual(exclude_terms.children, [("alive", False)])
+
+    def test_build_filter_compacts_exact_fields(self):
+        self.assertEqual(self.schema.exact_fields, frozenset(["age", "score", "born"]))
+        terms, _ = HaystackFilter.build_filter(self.view(), filters={"age": "10", "born": "2015-06-01,2015-06-02"})
+        self.assertEqual(
+            sorted(terms.children),
+            [("age", 10), ("born__in", [datetime.date(2015, 6, 1), datetime.date(2015, 6, 2)])]
+        )
+        # Text fields are analyzed, so their values are still OR-ed.
+        terms, _ = HaystackFilter.build_filter(self.view(), filters={"text": "John,Jack"})
+        self.assertEqual(len(terms.children), 2)
+
+
 class HaystackAutocompleteFilterTestCase(TestCase):
 
     fixtures = ["mockperson"]
@@ -235,6 +470,103 @@ class HaystackAutocompleteFilterTestCase(TestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
 
+class HaystackAutocompletePrefixCacheTestCase(TestCase):
+
+    fixtures = ["mockperson"]
+
+    def setUp(self):
+        MockPersonIndex().reindex()
+
+        class Serializer(HaystackSerializer):
+
+            class Meta:
+                index_classes = [MockPersonIndex]
+                fields = ["firstname", "lastname", "autocomplete"]
+
+        class AutocompleteFilter(HaystackAutocompleteFilter):
+            prefix_cache = LRUCache(maxsize=10, timeout=30)
+
+        class ViewSet(HaystackViewSet):
+            index_models = [MockPerson]
+            serializer_class = Serializer
+            filter_backends = [AutocompleteFilter]
+
+        self.filter = AutocompleteFilter
+        self.view = ViewSet
+
+    def tearDown(self):
+        MockPersonIndex().clear()
+
+    def get_names(self, data, searches=None):
+        request = factory.get(path="/", data=data, content_type="application/json")
+        with count_searches() as calls:
+            response = self.view.as_view(actions={"get": "list"})(request)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        if searches is not None:
+            self.assertEqual(len(calls), searches)
+        items = response.data["results"] if isinstance(response.data, dict) else response.data
+        return sorted(" ".join((item["firstname"], item["lastname"])) for item in items)
+
+    def test_prefix_candidates(self):
+        self.assertEqual(
+            list(HaystackAutocompleteFilter.get_prefix_candidates(("joh", "mc"))),
+            [("joh", "mc"), ("joh", "m"), ("joh",), ("jo",), ("j",)]
+        )
+
+    def test_extending_prefix_is_answered_from_cache(self):
+        self.assertEqual(len(self.get_names({"autocomplete": "jo"}, searches=1)), 4)
+        names = self.get_names({"autocomplete": "joh mc"}, searches=0)
+        self.assertEqual(len(names), 2)
+        self.assertEqual(self.get_names({"autocomplete": "joh m"}, searches=0), names)
+
+        self.filter.prefix_cache.clear()
+        self.assertEqual(self.get_names({"autocomplete": "joh mc"}, searches=1), names)
+
+        stats = self.filter.prefix_cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (0, 1))
+
+    def test_extending_prefix_without_results(self):
+        # The paginator slices the results, rather than iterating over them.
+        self.view.pagination_class = type(str("Pagination"), (HaystackPageNumberPagination,), {"page_size": 10})
+        self.get_names({"autocomplete": "jo"}, searches=1)
+        self.assertEqual(self.get_names({"autocomplete": "joxyzzy"}, searches=0), [])
+
+        self.assertEqual(self.get_names({"autocomplete": "xyzzy"}, searches=1), [])
+        self.assertEqual(self.get_names({"autocomplete": "xyzzy"}, searches=0), [])
+        # Queries are never refined from a remembered query without results.
+        self.assertEqual(self.get_names({"autocomplete": "xyzzy jo"}, searches=1), [])
+
+    def test_words_shorter_than_min_gram_skip_cache(self):
+        self.get_names({"autocomplete": "j"}, searches=1)
+        self.assertEqual(len(self.filter.prefix_cache), 0)
+        self.assertEqual(len(self.get_names({"autocomplete": "jo"}, searches=1)), 4)
+        self.get_names({"autocomplete": "joh"}, searches=0)
+
+    def test_other_field_types_skip_cache(self):
+        self.assertIsNone(self.filter.get_ngram_field_class(self.view(), "firstname"))
+        self.assertIs(self.filter.get_ngram_field_class(self.view(), "autocomplete"), indexes.EdgeNgramField)
+        self.get_names({"firstname": "john"}, searches=1)
+        self.get_names({"firstname": "johnny"}, searches=1)
+        self.assertEqual(len(self.filter.prefix_cache), 0)
+
+    def test_unstored_fields_skip_cache(self):
+        field = connections["default"].get_unified_index().get_index(MockPerson).fields["autocomplete"]
+        with mock.patch.object(field, "stored", False):
+            self.assertIsNone(self.filter.get_ngram_field_class(self.view(), "autocomplete"))
+
+    def test_incomplete_results_are_not_cached(self):
+        self.filter.prefix_cache_max_results = 2
+        self.get_names({"autocomplete": "jo"})
+        self.get_names({"autocomplete": "joh"})
+        stats = self.filter.prefix_cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["size"]), (0, 2, 0))
+
+    def test_other_filters_skip_cache(self):
+        self.get_names({"autocomplete": "jo"}, searches=1)
+        self.get_names({"autocomplete": "joh", "firstname": "john"})
+        self.assertEqual(self.filter.prefix_cache.stats()["hits"], 0)
+
+
 @skipIf(not geospatial_support, "Skipped due to lack of GEO spatial features")
 class HaystackGEOSpatialFilterTestCase(TestCase):
 
@@ -268,6 +600,21 @@ class HaystackGEOSpatialFilterTestCase(TestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data), 4)
 
+    def test_filter_dwithin_overridden_geo_filter(self):
+
+        class GeoFilter(HaystackGEOSpatialFilter):
+
+            def geo_filter(self, queryset, filters=None):
+                filters["km"] = 1
+                return super(GeoFilter, self).geo_filter(queryset, filters)
+
+        self.assertFalse(GeoFilter.uses_query_builder())
+        self.view.filter_backends = [GeoFilter]
+        request = factory.get(path="/", data={"from": "59.923396,10.739370"}, content_type="application/json")
+        response = self.view.as_view(actions={"get": "list"})(request)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 4)
+
     def test_filter_dwithin_without_range_unit(self):
         # If no range unit is supplied, no filtering will occur. Make sure we
         # get the entire data set.
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+#
+# Unit tests for the `drf_haystack.highlighting` classes.
+#
+
+from __future__ import absolute_import, unicode_literals
+
+import random
+
+from django.test import SimpleTestCase
+from haystack.utils import Highlighter
+
+from drf_haystack.highlighting import CompiledHighlighter
+
+
+class CompiledHighlighterTestCase(SimpleTestCase):
+
+    def test_highlighter_same_output_as_haystack(self):
+        text = "Jeremy Fowler\nJeremy is a nice chap! Not to be confused with another jeremy."
+        for query in ("jeremy", "Jeremy chap", "fowler -jeremy", "nope"):
+            self.assertEqual(
+                CompiledHighlighter(query).highlight(text),
+                Highlighter(query).highlight(text)
+            )
+
+    def test_highlighter_options(self):
+        highlighter = CompiledHighlighter("chap", html_tag="em", css_class="", max_length=10)
+        self.assertEqual(highlighter.highlight("Jeremy is a nice chap!"), "...<em>chap</em>!")
+
+    def test_highlighter_strips_tags(self):
+        highlighter = CompiledHighlighter("nice")
+        self.assertEqual(
+            highlighter.highlight("<p>a <b>nice</b> chap</p>"),
+            '...<span class="highlighted">nice</span> chap'
+        )
+
+    def test_highlighter_overlapping_words(self):
+        highlighter = CompiledHighlighter("nice nicer")
+        self.assertEqual(
+            highlighter.highlight("a nicer chap"),
+            Highlighter("nice nicer").highlight("a nicer chap")
+        )
+        self.assertEqual(highlighter.highlight("a nicer chap"), '...<span class="highlighted">nice</span>r chap')
+
+    def test_highlighter_window_without_close_matches(self):
+        text = "a foo %s foo end" % ("x" * 300)
+        self.assertEqual(CompiledHighlighter("foo").highlight(text), Highlighter("foo").highlight(text))
+        self.assertTrue(CompiledHighlighter("foo").highlight(text).startswith('a <span class="highlighted">foo'))
+
+    def test_highlighter_same_output_as_haystack_on_random_documents(self):
+        rnd = random.Random(42)
+        words = ["foo", "foobar", "bar", "oo", "baz", "Foo", "x" * 30, "aa", "a"]
+        for _ in range(300):
+            text = " ".join(rnd.choice(words) for _ in range(rnd.randint(0, 60)))
+            query = " ".join(rnd.sample(["foo", "foobar", "bar", "oo", "aa", "a", "-baz"], rnd.randint(1, 4)))
+            max_length = rnd.choice([5, 20, 50, 200])
+            self.assertEqual(
+                CompiledHighlighter(query, max_length=max_length).highlight(text),
+                Highlighter(query, max_length=max_length).highlight(text),
+                "%r %r %d" % (text, query, max_length)
+            )
+
+    def test_highlighter_finds_densest_window(self):
+        text = "%s foo %s foo bar foo %s" % ("x" * 40, "y" * 40, "z" * 40)
+        highlighter = CompiledHighlighter("foo bar", max_length=20)
+        start_offset = text.index("foo bar")
+        self.assertEqual(highlighter.find_best_window(highlighter.find_matches(text)),
+                         (start_offset, start_offset + 20))
+        self.assertTrue(highlighter.highlight(text).startswith(
+            '...<span class="highlighted">foo</span> <span class="highlighted">bar</span>'
+        ))
+
+    def test_highlighter_many(self):
+        highlighter = CompiledHighlighter("chap")
+        self.assertEqual(
+            highlighter.highlight_many(["nice chap", "no match"]),
+            ['...<span class="highlighted">chap</span>', "no match"]
+        )
@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+#
+# Unit tests for the `drf_haystack.pagination` classes.
+#
+
+from __future__ import absolute_import, unicode_literals
+
+import json
+
+from django.core.exceptions import ImproperlyConfigured
+from django.test import TestCase
+from haystack.query import SearchQuerySet
+from rest_framework import status
+from rest_framework.test import APIRequestFactory
+
+from drf_haystack.filters import HaystackAutocompleteFilter
+from drf_haystack.pagination import (
+    HaystackApproximateCountPagination, HaystackCursorPagination, HaystackLimitOffsetPagination,
+    HaystackNoCountPagination, HaystackPageNumberPagination
+)
+from drf_haystack.serializers import HaystackSerializer
+from drf_haystack.viewsets import HaystackViewSet
+
+from .mockapp.models import MockPerson
+from .mockapp.search_indexes import MockPersonIndex
+from .utils import count_searches
+
+factory = APIRequestFactory()
+
+
+class SearchPersonSerializer(HaystackSerializer):
+
+    class Meta:
+        index_classes = [MockPersonIndex]
+        fields = ["firstname", "lastname", "autocomplete"]
+
+
+class PaginationTestCaseMixin(object):
+
+    fixtures = ["mockperson"]
+
+    def setUp(self):
+        MockPersonIndex().reindex()
+        self.count = SearchQuerySet().models(MockPerson).count()
+
+    def tearDown(self):
+        MockPersonIndex().clear()
+
+    def get_view(self, pagination_class, filter_backends=None, **kwargs):
+        class ViewSet(HaystackViewSet):
+            index_models = [MockPerson]
+            serializer_class = SearchPersonSerializer
+
+        if filter_backends is not None:
+            ViewSet.filter_backends = filter_backends
+
+        ViewSet.pagination_class = type(str("Pagination"), (pagination_class,), kwargs)
+        return ViewSet
+
+    def get_response(self, view, url="/", data=None):
+        request = factory.get(path=url, data=data or {})
+        response = view.as_view(actions={"get": "list"})(request)
+        response.render()
+        return response
+
+    def get_data(self, view, url="/", data=None):
+        response = self.get_response(view, url, data)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return json.loads(response.content.decode())
+
+
+class HaystackPageNumberPaginationTestCase(PaginationTestCaseMixin, TestCase):
+
+    def test_pagination(self):
+        view = self.get_view(HaystackPageNumberPagination, page_size=4)
+        data = self.get_data(view, data={"page": 2})
+        self.assertEqual(data["count"], self.count)
+        self.assertEqual(len(data["results"]), 4)
+        self.assertTrue(data["next"].endswith("page=3"))
+
+    def test_pagination_max_result_window(self):
+        view = self.get_view(HaystackPageNumberPagination, page_size=4, max_result_window=10)
+        data = self.get_data(view, data={"page": 2})
+        self.assertEqual(data["count"], self.count)
+        self.assertEqual(data["next"], None)
+
+        self.assertEqual(self.get_response(view, data={"page": 3}).status_code, status.HTTP_404_NOT_FOUND)
+        data = self.get_data(view, data={"page": "last"})
+        self.assertTrue(data["previous"].endswith("/"))
+
+
+class HaystackLimitOffsetPaginationTestCase(PaginationTestCaseMixin, TestCase):
+
+    def test_pagination_max_result_window(self):
+        view = self.get_view(HaystackLimitOffsetPagination, default_limit=4, max_result_window=10)
+        data = self.get_data(view, data={"offset": 4})
+        self.assertEqual(len(data["results"]), 4)
+        self.assertTrue("offset=8" in data["next"])
+
+        data = self.get_data(view, data={"offset": 8})
+        self.assertEqual(data["count"], self.count)
+        self.assertEqual(len(data["results"]), 2)
+        self.assertEqual(data["next"], None)
+
+        self.assertEqual(self.get_response(view, data={"offset": 10}).status_code, status.HTTP_404_NOT_FOUND)
+
+
+class HaystackNoCountPaginationTestCase(PaginationTestCaseMixin, TestCase):
+
+    def test_pagination(self):
+        view = self.get_view(HaystackNoCountPagination, page_size=4)
+        data = self.get_data(view)
+        self.assertEqual(list(data.keys()), ["next", "previous", "results"])
+        self.assertEqual(len(data["results"]), 4)
+        self.assertTrue(data["next"].endswith("page=2"))
+        self.assertEqual(data["previous"], None)
+
+        data = self.get_data(view, data={"page": 2})
+        self.assertTrue(data["previous"].endswith("/"))
+
+        view = self.get_view(HaystackNoCountPagination, page_size=self.count)
+        data = self.get_data(view)
+        self.assertEqual(len(data["results"]), self.count)
+        self.assertEqual(data["next"], None)
+
+        for page in (1000, "last", 0):
+            self.assertEqual(self.get_response(view, data={"page": page}).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_pagination_max_result_window(self):
+        view = self.get_view(HaystackNoCountPagination, page_size=4, max_result_window=10)
+        self.assertEqual(self.get_data(view, data={"page": 2})["next"], None)
+        self.assertEqual(self.get_response(view, data={"page": 3}).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_pagination_autocomplete(self):
+        view = self.get_view(HaystackNoCountPagination, page_size=1, filter_backends=[HaystackAutocompleteFilter])
+        data = self.get_data(view, data={"autocomplete": "jer"})
+        self.assertEqual(len(data["results"]), 1)
+        self.assertTrue(data["results"][0]["firstname"].startswith("Jer"))
+        self.assertTrue(data["next"] is not None)
+
+    def test_approximate_count_pagination(self):
+        view = self.get_view(HaystackApproximateCountPagination, page_size=4)
+        data = self.get_data(view)
+        self.assertEqual(data["count"], self.count)
+        self.assertFalse(data["count_is_approximate"])
+
+        view = self.get_view(HaystackApproximateCountPagination, page_size=4, max_count=5)
+        data = self.get_data(view)
+        self.assertEqual(data["count"], 5)
+        self.assertTrue(data["count_is_approximate"])
+
+
+class HaystackCursorPaginationTestCase(PaginationTestCaseMixin, TestCase):
+
+    def test_cursor_pagination(self):
+        view = self.get_view(HaystackCursorPagination, page_size=4, uid_field="django_id")
+        pages, url = [], "/"
+        while url:
+            data = self.get_data(view, url=url)
+            self.assertTrue(len(data["results"]) <= 4)
+            self.assertEqual(data["previous"] is None, not pages)
+            pages.append(data)
+            url = data["next"]
+
+        results = [(result["firstname"], result["lastname"]) for page in pages for result in page["results"]]
+        self.assertEqual(len(results), self.count)
+        self.assertEqual(
+            sorted(results),
+            sorted((result.firstname, result.lastname) for result in SearchQuerySet().models(MockPerson))
+        )
+
+        # Paginate backwards from the last page
+        for page in reversed(pages[:-1]):
+            data = self.get_data(view, url=url or pages[-1]["previous"])
+            self.assertEqual(data["results"], page["results"])
+            url = data["previous"]
+        self.assertEqual(url, None)
+
+    def test_cursor_pagination_query(self):
+        query = HaystackCursorPagination.get_cursor_query(("lastname", "-id"), ["Doe", "mockapp.mockperson.1"])
+        self.assertEqual(
+            SearchQuerySet().filter(query).query.build_query(),
+            SearchQuerySet().filter(
+                lastname__gt="Doe"
+            ).filter_or(lastname__exact="Doe", id__lt="mockapp.mockperson.1").query.build_query()
+        )
+
+    def test_cursor_pagination_uid_field(self):
+        pagination = HaystackCursorPagination()
+        pagination.ordering = "-lastname"
+        for uid_field in (None, "id"):
+            pagination.uid_field = uid_field
+            self.assertRaises(ImproperlyConfigured, pagination.get_ordering, None)
+        pagination.uid_field = "uid_exact"
+        self.assertEqual(pagination.get_ordering(None), ("-lastname", "uid_exact"))
+        pagination.ordering = ("django_id",)
+        pagination.uid_field = "django_id"
+        self.assertEqual(pagination.get_ordering(None), ("django_id",))
+
+    def test_cursor_pagination_invalid_cursor(self):
+        view = self.get_view(HaystackCursorPagination, page_size=4, uid_field="django_id")
+        for cursor in ("invalid", "eyJwIjogMX0="):
+            response = self.get_response(view, data={"cursor": cursor})
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class HaystackPaginationBackendRequestsTestCase(PaginationTestCaseMixin, TestCase):
+
+    def assertBackendSearches(self, expected, view, url="/", data=None):
+        with count_searches() as calls:
+            response_data = self.get_data(view, url=url, data=data)
+        self.assertEqual(len(calls), expected)
+        return response_data
+
+    def test_page_number_pagination_single_request(self):
+        view = self.get_view(HaystackPageNumberPagination, page_size=4)
+        for page in (1, 2):
+            data = self.assertBackendSearches(1, view, data={"page": page})
+            self.assertEqual(data["count"], self.count)
+            self.assertEqual(len(data["results"]), 4)
+
+    def test_limit_offset_pagination_single_request(self):
+        view = self.get_view(HaystackLimitOffsetPagination, default_limit=4)
+        data = self.assertBackendSearches(1, view, data={"offset": 4})
+        self.assertEqual(data["count"], self.count)
+        self.assertEqual(len(data["results"]), 4)
+
+    def test_no_count_pagination_single_request(self):
+        for pagination_class in (HaystackNoCountPagination, HaystackApproximateCountPagination):
+            view = self.get_view(pagination_class, page_size=4)
+            self.assertEqual(len(self.assertBackendSearches(1, view)["results"]), 4)
+
+    def test_cursor_pagination_single_request(self):
+        view = self.get_view(HaystackCursorPagination, page_size=4, uid_field="django_id")
+        data = self.assertBackendSearches(1, view)
+        self.assertBackendSearches(1, view, url=data["next"])
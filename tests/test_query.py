@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+#
+# Unit tests for the `drf_haystack.query` classes.
+#
+
+from __future__ import absolute_import, unicode_literals
+
+import mock
+from django.test import TestCase
+from haystack.models import SearchResult
+from haystack.query import SQ, EmptySearchQuerySet, SearchQuerySet
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from drf_haystack.filters import HaystackBoostFilter, HaystackFilter, HaystackHighlightFilter
+from drf_haystack.query import HaystackQueryBuilder, prime_results
+from drf_haystack.serializers import HaystackSerializer
+from drf_haystack.viewsets import HaystackViewSet
+
+from .mockapp.models import MockPerson
+from .mockapp.search_indexes import MockPersonIndex
+from .utils import count_searches
+
+factory = APIRequestFactory()
+
+
+class HaystackQueryBuilderTestCase(TestCase):
+
+    def setUp(self):
+        self.queryset = SearchQuerySet()
+
+    def test_builder_applies_clauses(self):
+        builder = HaystackQueryBuilder(self.queryset, {})
+        builder.add_filter(SQ(firstname="John") | SQ(firstname="Jack"))
+        builder.add_exclusion(SQ(lastname="McClane"))
+        builder.add_boost("nice", 1.5)
+        builder.add_highlight()
+        queryset = builder.apply()
+
+        expected = self.queryset.filter(SQ(firstname="John") | SQ(firstname="Jack")).exclude(
+            SQ(lastname="McClane")).boost("nice", 1.5).highlight()
+        self.assertEqual(queryset.query.build_query(), expected.query.build_query())
+        self.assertEqual(queryset.query.boost, {"nice": 1.5})
+        self.assertTrue(queryset.query.highlight)
+        # The original queryset is left untouched.
+        self.assertEqual(self.queryset.query.build_query(), "*")
+
+    def test_builder_without_clauses(self):
+        self.assertIs(HaystackQueryBuilder(self.queryset, {}).apply(), self.queryset)
+
+    def test_builder_empty(self):
+        builder = HaystackQueryBuilder(self.queryset, {})
+        builder.add_filter(SQ(firstname="John"))
+        builder.set_empty()
+        self.assertIsInstance(builder.apply(), EmptySearchQuerySet)
+
+    def test_prime_results(self):
+        results = [SearchResult("mockapp", "mockperson", pk, 1) for pk in ("1", "2")]
+        with count_searches() as calls:
+            queryset = prime_results(self.queryset, results)
+            self.assertEqual(list(queryset[:10]), results)
+            self.assertEqual(queryset.count(), 2)
+
+            queryset = prime_results(self.queryset, [])
+            self.assertEqual(list(queryset[:10]), [])
+            self.assertEqual(queryset.count(), 0)
+        self.assertEqual(calls, [])
+
+
+class HaystackFilterPipelineTestCase(TestCase):
+
+    def setUp(self):
+
+        class Serializer(HaystackSerializer):
+
+            class Meta:
+                index_classes = [MockPersonIndex]
+                fields = ["text", "firstname", "lastname"]
+
+        class ViewSet(HaystackViewSet):
+            index_models = [MockPerson]
+            serializer_class = Serializer
+            filter_backends = [HaystackFilter, HaystackBoostFilter, HaystackHighlightFilter]
+
+        self.view_class = ViewSet
+
+    def get_view(self, data):
+        request = Request(factory.get(path="/", data=data))
+        return self.view_class(request=request, kwargs={}, format_kwarg=None)
+
+    def filter_queryset(self, view):
+        queryset = view.get_queryset()
+        clone = SearchQuerySet._clone
+        calls = []
+
+        def counting_clone(queryset, *args, **kwargs):
+            calls.append(args)
+            return clone(queryset, *args, **kwargs)
+
+        with mock.patch.object(SearchQuerySet, "_clone", counting_clone):
+            queryset = view.filter_queryset(queryset)
+        return queryset, len(calls)
+
+    def test_filter_backends_clone_once(self):
+        queryset, clones = self.filter_queryset(self.get_view({"firstname": "John", "boost": "nice,1.1"}))
+        self.assertEqual(clones, 1)
+        self.assertEqual(queryset.query.boost, {"nice": 1.1})
+        self.assertTrue(queryset.query.highlight)
+        # The filters added by every backend are merged.
+        self.assertEqual(queryset.query.build_query(), "firstname:(John) nice^1.1")
+
+    def test_filter_backend_overriding_filter_queryset(self):
+
+        class CustomFilter(HaystackFilter):
+
+            def filter_queryset(self, request, queryset, view):
+                return queryset.filter(lastname="McClane")
+
+        self.assertFalse(CustomFilter.uses_query_builder())
+        self.view_class.filter_backends = [HaystackFilter, CustomFilter, HaystackBoostFilter]
+        queryset, clones = self.filter_queryset(self.get_view({"firstname": "John", "boost": "nice,1.1"}))
+        self.assertEqual(clones, 3)
+        self.assertEqual(queryset.query.boost, {"nice": 1.1})
+        # The backends after `CustomFilter` add their filters to a new builder.
+        self.assertEqual(
+            queryset.query.build_query(),
+            "(firstname:(John) AND lastname:(McClane) AND firstname:(John)) nice^1.1"
+        )
+
+    def test_filter_backend_overriding_queryset_hook(self):
+
+        class CustomBoostFilter(HaystackBoostFilter):
+            calls = []
+
+            @classmethod
+            def apply_boost(cls, queryset, filters):
+                cls.calls.append(filters["boost"])
+                return super(CustomBoostFilter, cls).apply_boost(queryset, filters)
+
+        self.assertTrue(HaystackBoostFilter.uses_query_builder())
+        self.assertFalse(CustomBoostFilter.uses_query_builder())
+        self.view_class.filter_backends = [HaystackFilter, CustomBoostFilter]
+        queryset, clones = self.filter_queryset(self.get_view({"firstname": "John", "boost": "nice,1.1"}))
+        self.assertEqual(CustomBoostFilter.calls, ["nice,1.1"])
+        self.assertEqual(queryset.query.boost, {"nice": 1.1})
+        # Like any backend overriding a queryset method, it re-applies the request filters.
+        self.assertEqual(queryset.query.build_query(), "(firstname:(John) AND firstname:(John)) nice^1.1")
+
+    def test_filter_backends_share_params(self):
+        with mock.patch.object(HaystackFilter, "get_request_filters") as get_request_filters:
+            queryset, clones = self.filter_queryset(self.get_view({"firstname": "John", "boost": "nice,1.1"}))
+        self.assertEqual(get_request_filters.call_count, 0)
+        self.assertEqual(queryset.query.build_query(), "firstname:(John) nice^1.1")
+
+    def test_filter_backend_overriding_request_filters(self):
+
+        class CustomFilter(HaystackFilter):
+
+            def get_request_filters(self, request):
+                filters = super(CustomFilter, self).get_request_filters(request)
+                filters["lastname"] = "McClane"
+                return filters
+
+        self.assertFalse(CustomFilter.uses_query_builder())
+        self.view_class.filter_backends = [CustomFilter]
+        queryset, clones = self.filter_queryset(self.get_view({"firstname": "John"}))
+        self.assertEqual(queryset.query.build_query(), "(firstname:(John) AND lastname:(McClane))")
+
+    def test_request_filters_are_mutable(self):
+        view = self.get_view({"firstname": "John"})
+        filters = HaystackFilter().get_request_filters(view.request)
+        filters["firstname"] = "Jack"
+        self.assertEqual(view.request.GET["firstname"], "John")
@@ -8,16 +8,21 @@ from __future__ import absolute_import, unicode_literals
 import json
 import warnings
 
+import mock
+
 from django.conf.urls import url, include
 from django.core.exceptions import ImproperlyConfigured
 from django.test import TestCase
+from haystack.models import SearchResult
 from haystack.query import SearchQuerySet
 from rest_framework import serializers
 from rest_framework.routers import DefaultRouter
 from rest_framework.test import APIRequestFactory, APITestCase
 
 from drf_haystack.generics import SQHighlighterMixin
-from drf_haystack.serializers import HighlighterMixin, HaystackSerializer, HaystackSerializerMixin
+from drf_haystack.serializers import (
+    HighlighterMixin, HaystackFastSerializer, HaystackSerializer, HaystackSerializerMixin
+)
 from drf_haystack.viewsets import HaystackViewSet
 
 from .mockapp.models import MockPerson, MockPet
@@ -185,6 +190,40 @@ class HaystackSerializerTestCase(WarningTestCaseMixin, TestCase):
         assert isinstance(fields["lastname"], CharField), self.fail("serializer 'lastname' field is not a CharField instance")
         assert isinstance(fields["autocomplete"], CharField), self.fail("serializer 'autocomplete' field is not a CharField instance")
 
+    def test_serializer_field_plan_is_compiled_once(self):
+        serializer = self.serializer4()
+        plan = serializer._get_field_plan()
+        self.assertIs(self.serializer4()._get_field_plan(), plan)
+        self.assertEqual(
+            set(name for name, field_class, kwargs in plan),
+            set(["text", "firstname", "lastname", "autocomplete", "integer_field", "city"])
+        )
+
+        # Field instances must never be shared between serializer instances.
+        self.assertIsNot(serializer.fields["firstname"], self.serializer4().fields["firstname"])
+
+        self.serializer4.clear_field_cache()
+        self.assertIsNot(self.serializer4()._get_field_plan(), plan)
+
+    def test_serializer_renders_fields_added_by_get_fields(self):
+        class Serializer1(HaystackSerializer):
+            class Meta:
+                index_classes = [MockPersonIndex]
+                fields = ["firstname", "lastname"]
+
+            def get_fields(self):
+                fields = super(Serializer1, self).get_fields()
+                fields["name"] = serializers.SerializerMethodField()
+                return fields
+
+            def get_name(self, instance):
+                return " ".join((instance.firstname, instance.lastname))
+
+        data = Serializer1(instance=SearchQuerySet().models(MockPerson), many=True).data
+        self.assertTrue(len(data) > 0)
+        for result in data:
+            self.assertEqual(result["name"], " ".join((result["firstname"], result["lastname"])))
+
 
 class HaystackSerializerMultipleIndexTestCase(WarningTestCaseMixin, TestCase):
 
@@ -285,6 +324,100 @@ class HaystackSerializerMultipleIndexTestCase(WarningTestCaseMixin, TestCase):
             else:
                 self.fail("Result should contain either Pet or Person fields")
 
+    def test_serializer_multiple_index_representation_plan(self):
+        serializer = self.serializer2()
+        person_plan = dict(serializer._get_representation_plan(MockPersonIndex))
+        pet_plan = dict(serializer._get_representation_plan(MockPetIndex))
+
+        self.assertEqual(person_plan["_MockPersonIndex__lastname"], "lastname")
+        self.assertEqual(person_plan["_MockPersonIndex__hair_color"], "hair_color")
+        self.assertEqual(person_plan["extra"], "extra")
+        self.assertFalse(any(name.startswith("_MockPetIndex__") for name in person_plan))
+
+        self.assertEqual(pet_plan["_MockPetIndex__species"], "species")
+        self.assertEqual(pet_plan["extra"], "extra")
+        self.assertFalse(any(name.startswith("_MockPersonIndex__") for name in pet_plan))
+
+
+class HaystackFastSerializerTestCase(TestCase):
+
+    fixtures = ["mockperson", "mockpet"]
+
+    def setUp(self):
+        MockPersonIndex().reindex()
+        MockPetIndex().reindex()
+
+    def tearDown(self):
+        MockPersonIndex().clear()
+        MockPetIndex().clear()
+
+    def assertSameData(self, serializer_class, fast_serializer_class, objs):
+        data = serializer_class(instance=objs, many=True).data
+        fast_data = fast_serializer_class(instance=objs, many=True).data
+        self.assertTrue(len(data) > 0)
+        self.assertEqual([dict(result) for result in data], list(fast_data))
+        self.assertTrue(all(type(result) is dict for result in fast_data))
+
+    def test_fast_serializer_same_data(self):
+        class PersonMeta:
+            index_classes = [MockPersonIndex]
+            fields = ["firstname", "lastname", "full_name"]
+
+        class Serializer1(HaystackSerializer):
+            Meta = PersonMeta
+
+        class FastSerializer1(HaystackFastSerializer):
+            Meta = PersonMeta
+
+        self.assertSameData(Serializer1, FastSerializer1, SearchQuerySet().models(MockPerson))
+
+    def test_fast_serializer_multiple_index_same_data(self):
+        class MultipleIndexMeta:
+            index_classes = [MockPersonIndex, MockPetIndex]
+            exclude = ["firstname"]
+            index_aliases = {
+                "mockapp.MockPersonIndex": "People"
+            }
+
+        class Serializer1(HaystackSerializer):
+            extra = serializers.CharField(source="text")
+            Meta = MultipleIndexMeta
+
+        class FastSerializer1(HaystackFastSerializer):
+            extra = serializers.CharField(source="text")
+            Meta = MultipleIndexMeta
+
+        self.assertSameData(Serializer1, FastSerializer1, SearchQuerySet().filter(text="John"))
+
+    def test_fast_serializer_row_plan(self):
+        class FastSerializer1(HaystackFastSerializer):
+            class Meta:
+                index_classes = [MockPersonIndex, MockPetIndex]
+                fields = ["firstname", "name"]
+
+        serializer = FastSerializer1()
+        plan = serializer._get_row_plan(MockPetIndex)
+        self.assertEqual([(output_name, attribute) for output_name, attribute, formatter, field_name in plan],
+                         [("name", "name")])
+        self.assertTrue(serializer._get_row_plan(MockPetIndex) is plan)
+        # The plans are built from the bound fields of every instance.
+        self.assertFalse(FastSerializer1()._get_row_plan(MockPetIndex) is plan)
+
+    def test_fast_serializer_renders_fields_added_by_get_fields(self):
+        class FastSerializer1(HaystackFastSerializer):
+            class Meta:
+                index_classes = [MockPersonIndex]
+                fields = ["firstname"]
+
+            def get_fields(self):
+                fields = super(FastSerializer1, self).get_fields()
+                fields["name"] = serializers.CharField(source="full_name")
+                return fields
+
+        data = FastSerializer1(instance=SearchQuerySet().models(MockPerson), many=True).data
+        self.assertTrue(len(data) > 0)
+        self.assertTrue(all(set(result) == set(["firstname", "name"]) for result in data))
+
 
 class HaystackSerializerHighlighterMixinTestCase(WarningTestCaseMixin, TestCase):
 
@@ -355,6 +488,89 @@ class HaystackSerializerHighlighterMixinTestCase(WarningTestCaseMixin, TestCase)
                 }, "%s" % "is a nice chap!"))
             )
 
+    def test_serializer_highlighter_terms(self):
+        request = factory.get(path="/", data={
+            "firstname": "jeremy", "lastname__not": "fowler", "page": "2", "boost": "rowland,1.1"
+        })
+        serializer = self.viewset2.serializer_class(context={"request": request})
+        self.assertEqual(serializer.get_highlight_terms(request), "jeremy")
+
+    def test_serializer_highlighter_is_reused(self):
+        from haystack.utils import Highlighter
+
+        class CountingHighlighter(Highlighter):
+            instances = 0
+
+            def __init__(self, *args, **kwargs):
+                CountingHighlighter.instances += 1
+                super(CountingHighlighter, self).__init__(*args, **kwargs)
+
+        class Serializer4(self.viewset2.serializer_class):
+            highlighter_class = CountingHighlighter
+
+        request = factory.get(path="/", data={"firstname": "jeremy"})
+        objs = SearchQuerySet().filter(firstname="jeremy")
+        self.assertTrue(len(objs) > 1)
+        data = Serializer4(instance=objs, many=True, context={"request": request}).data
+        self.assertTrue(all("highlighted" in result for result in data))
+        self.assertEqual(CountingHighlighter.instances, 1)
+
+    def test_serializer_compiled_highlighter_multiple_fields(self):
+        from drf_haystack.highlighting import CompiledHighlighter
+
+        class Serializer4(self.viewset2.serializer_class):
+            highlighter_class = CompiledHighlighter
+            highlighter_field = ("firstname", "description")
+
+        request = factory.get(path="/", data={"firstname": "jeremy"})
+        objs = SearchQuerySet().filter(firstname="jeremy")
+        data = Serializer4(instance=objs, many=True, context={"request": request}).data
+        for result in data:
+            self.assertEqual(set(result["highlighted"].keys()), set(["firstname", "description"]))
+            self.assertEqual(result["highlighted"]["firstname"],
+                             '<div class="my-fancy-highlighter">Jeremy</div>')
+
+    def test_serializer_highlighter_cache(self):
+        from drf_haystack.utils import LRUCache
+
+        class Serializer4(self.viewset2.serializer_class):
+            highlighter_cache = LRUCache(maxsize=100)
+
+        objs = SearchQuerySet().filter(firstname="jeremy")
+        for terms in ("jeremy", "jeremy", "Jeremy "):
+            request = factory.get(path="/", data={"firstname": terms})
+            data = Serializer4(instance=objs, many=True, context={"request": request}).data
+            self.assertTrue(all("highlighted" in result for result in data))
+
+        count = len(objs)
+        self.assertEqual(Serializer4.highlighter_cache.stats()["misses"], count)
+        self.assertEqual(Serializer4.highlighter_cache.stats()["hits"], 2 * count)
+
+        request = factory.get(path="/", data={"firstname": "jeremy"})
+        serializer = Serializer4(context={"request": request})
+        self.assertNotEqual(
+            serializer.get_snippet_cache_key(objs[0], "description", serializer.get_request_highlighter()),
+            serializer.get_snippet_cache_key(objs[0], "firstname", serializer.get_request_highlighter())
+        )
+
+    def test_serializer_highlighter_cache_without_stored_id(self):
+        from drf_haystack.utils import LRUCache
+
+        class Serializer4(self.viewset2.serializer_class):
+            highlighter_cache = LRUCache(maxsize=100)
+            highlighter_field = "description"
+
+        # Results of the same index, without an `id` field.
+        objs = [
+            SearchResult("mockapp", "mockperson", pk, 1, description="nice chap, %s" % name)
+            for pk, name in ((1, "Jeremy"), (2, "Jeremiah"))
+        ]
+        self.assertIsNone(objs[0].id)
+        request = factory.get(path="/", data={"description": "nice"})
+        data = Serializer4(instance=objs, many=True, context={"request": request}).data
+        self.assertTrue(data[0]["highlighted"].endswith("chap, Jeremy"))
+        self.assertTrue(data[1]["highlighted"].endswith("chap, Jeremiah"))
+
     def test_serializer_highlighter_raise_no_highlighter_class(self):
         request = factory.get(path="/", data={"firstname": "jeremy"}, content_type="application/json")
         try:
@@ -436,6 +652,72 @@ class HaystackSerializerMixinTestCase(WarningTestCaseMixin, TestCase):
             }]
         )
 
+    def test_serializer_mixin_loads_objects_in_bulk(self):
+        objs = list(SearchQuerySet().filter(text="John"))
+        self.assertTrue(len(objs) > 1)
+        serializer = self.serializer1(instance=objs, many=True)
+        with self.assertNumQueries(1):
+            data = serializer.data
+        self.assertEqual(len(data), len(objs))
+
+    def test_serializer_mixin_skips_deleted_objects(self):
+        objs = list(SearchQuerySet().filter(text="John"))
+        MockPerson.objects.filter(pk=objs[0].pk).delete()
+        serializer = self.serializer1(instance=objs, many=True)
+        with self.assertNumQueries(1):
+            data = serializer.data
+        self.assertEqual(len(data), len(objs) - 1)
+        self.assertNotIn(int(objs[0].pk), [result["id"] for result in data])
+
+    def test_serializer_mixin_restricts_object_fields(self):
+        from django.db import connection
+        from django.test.utils import override_settings
+
+        class Serializer2(HaystackSerializerMixin, serializers.ModelSerializer):
+            class Meta:
+                model = MockPerson
+                fields = ("id", "firstname")
+                search_fields = ("text", )
+                restrict_object_fields = True
+
+        def get_sql():
+            serializer = Serializer2(instance=SearchQuerySet().filter(text="John"), many=True)
+            # `CaptureQueriesContext` isn't available in Django 1.5.
+            with override_settings(DEBUG=True):
+                start = len(connection.queries)
+                serializer.data
+                queries = connection.queries[start:]
+            self.assertEqual(len(queries), 1)
+            return queries[0]["sql"]
+
+        sql = get_sql()
+        self.assertIn("firstname", sql)
+        self.assertNotIn("lastname", sql)
+
+        # Fields can't be deferred when the index selects related objects.
+        with mock.patch.object(MockPersonIndex, "read_queryset", lambda index, using=None:
+                               MockPerson.objects.select_related()):
+            self.assertIn("lastname", get_sql())
+
+        # Nor are they by default.
+        Serializer2.Meta.restrict_object_fields = False
+        self.assertIn("lastname", get_sql())
+
+    def test_serializer_mixin_object_querysets(self):
+
+        class Serializer2(self.serializer1):
+            class Meta(self.serializer1.Meta):
+                object_querysets = {
+                    MockPerson: MockPerson.objects.filter(firstname="John")
+                }
+
+        objs = SearchQuerySet().filter(text="John")
+        serializer = Serializer2(instance=objs, many=True)
+        with self.assertNumQueries(1):
+            data = serializer.data
+        self.assertTrue(len(data) > 0)
+        self.assertTrue(all(result["firstname"] == "John" for result in data))
+
 
 class HaystackMultiSerializerTestCase(WarningTestCaseMixin, TestCase):
 
@@ -486,3 +768,22 @@ class HaystackMultiSerializerTestCase(WarningTestCaseMixin, TestCase):
                 "description": "Zane is a nice chap!"
             }]
         )
+
+    def test_multi_serializer_reuses_child_serializers(self):
+        objs = SearchQuerySet().filter(text="John")
+        serializer = self.serializer1(instance=objs, many=True)
+        serializer.data
+
+        child_serializers = serializer.child._child_serializers
+        self.assertEqual(set(child_serializers), set([MockPersonIndex, MockPetIndex]))
+        context, person_serializer = child_serializers[MockPersonIndex]
+
+        result = [obj for obj in objs if obj.model is MockPerson][0]
+        serializer.child.to_representation(result)
+        self.assertIs(child_serializers[MockPersonIndex][1], person_serializer)
+
+        # A new context must give a new child serializer
+        serializer.child._context = {"request": None}
+        serializer.child.to_representation(result)
+        self.assertIsNot(child_serializers[MockPersonIndex][1], person_serializer)
+        self.assertIs(child_serializers[MockPersonIndex][1]._context, serializer.child._context)
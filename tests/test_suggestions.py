@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+#
+# Unit tests for the `drf_haystack.suggestions` module.
+#
+
+from __future__ import absolute_import, unicode_literals
+
+import threading
+
+import mock
+
+from django.test import TestCase
+from rest_framework import status
+from rest_framework.test import APIRequestFactory
+
+from drf_haystack.cache import bump_generation, refreshes
+from drf_haystack.filters import HaystackAutocompleteFilter
+from drf_haystack.pagination import HaystackPageNumberPagination
+from drf_haystack.serializers import HaystackSerializer
+from drf_haystack.suggestions import SuggestionIndex, split_words
+from drf_haystack.utils import get_cache
+from drf_haystack.viewsets import HaystackViewSet
+
+from .mockapp.models import MockPerson, MockPet
+from .mockapp.search_indexes import MockPersonIndex
+from .utils import count_searches
+
+factory = APIRequestFactory()
+
+
+class SuggestionIndexTestCase(TestCase):
+
+    fixtures = ["mockperson"]
+
+    def setUp(self):
+        MockPersonIndex().reindex()
+        get_cache("default").clear()
+
+        class Serializer(HaystackSerializer):
+
+            class Meta:
+                index_classes = [MockPersonIndex]
+                fields = ["firstname", "lastname", "autocomplete"]
+
+        class ViewSet(HaystackViewSet):
+            index_models = [MockPerson]
+            serializer_class = Serializer
+            filter_backends = [HaystackAutocompleteFilter]
+
+        self.view = ViewSet
+        self.suggestion_index = SuggestionIndex(models=[MockPerson], fields=["firstname", "lastname"])
+
+    def tearDown(self):
+        MockPersonIndex().clear()
+
+    def get_response(self, view, data):
+        request = factory.get(path="/", data=data, content_type="application/json")
+        with count_searches() as calls:
+            response = view.as_view(actions={"get": "list"})(request)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response, len(calls)
+
+    def test_split_words(self):
+        self.assertEqual(split_words("John McClane-Jr."), ["john", "mcclane", "jr"])
+
+    def test_search(self):
+        names = sorted(result.firstname for result in self.suggestion_index.search("joh MC"))
+        self.assertEqual(names, ["John", "John"])
+        self.assertEqual(len(self.suggestion_index.search("jer")), 2)
+        self.assertEqual(len(self.suggestion_index.search("jo")), 4)
+        self.assertEqual(self.suggestion_index.search("xyzzy"), [])
+        self.assertEqual(self.suggestion_index.search(""), [])
+
+    def test_search_max_results(self):
+        self.suggestion_index.max_results = 3
+        self.suggestion_index.build()
+        # Precomputed and matched prefixes are both limited.
+        self.assertEqual(len(self.suggestion_index.search("jo")), 3)
+        self.suggestion_index.precompute_length = 0
+        self.suggestion_index.build()
+        self.assertEqual(len(self.suggestion_index.search("jo")), 3)
+
+    def test_search_gram_bounds(self):
+        self.assertFalse(self.suggestion_index.is_searchable("j"))
+        self.assertFalse(self.suggestion_index.is_searchable("jo m"))
+        self.assertFalse(self.suggestion_index.is_searchable("john" * 4))
+        self.assertTrue(self.suggestion_index.is_searchable("jo mc"))
+        self.assertEqual(self.suggestion_index.search("j"), [])
+
+    def test_search_returns_copies(self):
+        result = self.suggestion_index.search("jer")[0]
+        result.firstname = "Changed"
+        self.assertNotIn("Changed", [r.firstname for r in self.suggestion_index.search("jer")])
+
+    def test_search_returns_compact_results(self):
+        result = self.suggestion_index.search("jer")[0]
+        self.assertEqual((result.app_label, result.model_name), ("mockapp", "mockperson"))
+        self.assertEqual(MockPerson.objects.get(pk=result.pk).firstname, result.firstname)
+        self.assertTrue(result.autocomplete)
+        # Only the indexed and the stored fields are kept.
+        self.assertIsNone(result.text)
+
+    def test_build_loads_documents_by_keyset(self):
+        self.suggestion_index.batch_size = 30
+        with count_searches() as calls:
+            self.suggestion_index.build()
+        self.assertEqual(len(self.suggestion_index._state[1]), MockPerson.objects.count())
+        self.assertEqual(len(calls), 4)
+        self.assertEqual(set(call["start_offset"] for call in calls), set([0]))
+
+    def test_refresh_on_generation_change(self):
+        self.suggestion_index.check_interval = 0
+        self.suggestion_index.refresh()
+        self.assertFalse(self.suggestion_index.is_stale())
+        bump_generation(MockPerson)
+        self.assertTrue(self.suggestion_index.is_stale())
+
+    def test_refresh_on_generation_change_of_indexed_models(self):
+        suggestion_index = SuggestionIndex(check_interval=0)
+        self.assertTrue(set([MockPerson, MockPet]) <= set(suggestion_index.get_models()))
+        suggestion_index.refresh()
+        bump_generation(MockPerson)
+        self.assertTrue(suggestion_index.is_stale())
+
+    def test_generation_check_is_throttled(self):
+        self.suggestion_index.refresh()
+        with mock.patch("drf_haystack.suggestions.get_generations") as get_generations:
+            bump_generation(MockPerson)
+            for _ in range(3):
+                self.assertFalse(self.suggestion_index.is_stale())
+            self.assertEqual(get_generations.call_count, 0)
+
+    def test_refresh_in_background(self):
+        suggestion_index = self.suggestion_index
+        suggestion_index.check_interval = 0
+        suggestion_index.refresh()
+        state = suggestion_index._state
+
+        started, release = threading.Event(), threading.Event()
+        build = suggestion_index.build
+
+        def slow_build():
+            started.set()
+            release.wait(5)
+            build()
+
+        suggestion_index.build = slow_build
+        bump_generation(MockPerson)
+        # The stale index answers while the new one is built.
+        self.assertEqual(len(suggestion_index.search("jer")), 2)
+        self.assertTrue(started.wait(5))
+        self.assertIs(suggestion_index._state, state)
+
+        release.set()
+        refreshes.join()
+        self.assertIsNot(suggestion_index._state, state)
+        self.assertFalse(suggestion_index.is_stale())
+
+    def test_view_answers_from_suggestion_index(self):
+        expected, _ = self.get_response(self.view, {"autocomplete": "joh mc"})
+
+        self.view.suggestion_index = self.suggestion_index
+        self.suggestion_index.refresh()
+        response, searches = self.get_response(self.view, {"autocomplete": "joh mc"})
+        self.assertEqual(searches, 0)
+        self.assertEqual(
+            sorted(item["firstname"] + item["lastname"] for item in response.data),
+            sorted(item["firstname"] + item["lastname"] for item in expected.data)
+        )
+
+    def test_view_answers_without_results(self):
+        self.view.suggestion_index = self.suggestion_index
+        self.view.pagination_class = type(str("Pagination"), (HaystackPageNumberPagination,), {"page_size": 10})
+        self.suggestion_index.refresh()
+        response, searches = self.get_response(self.view, {"autocomplete": "xyzzy"})
+        self.assertEqual(searches, 0)
+        self.assertEqual((response.data["count"], response.data["results"]), (0, []))
+
+    def test_view_falls_back_to_backend(self):
+        self.view.suggestion_index = self.suggestion_index
+        self.suggestion_index.refresh()
+        for data in ({"autocomplete": "joh", "firstname": "john"}, {"autocomplete": "joh,jer"},
+                     {"autocomplete__not": "joh"}, {"autocomplete": "j"}):
+            response, searches = self.get_response(self.view, data)
+            self.assertGreater(searches, 0)
+
+    def test_view_ignores_index_of_other_models(self):
+        self.view.suggestion_index = SuggestionIndex(fields=["firstname", "lastname"])
+        self.assertFalse(self.view.suggestion_index.holds_models(self.view.index_models))
+        response, searches = self.get_response(self.view, {"autocomplete": "joh"})
+        self.assertGreater(searches, 0)
+        self.assertTrue(all(item["firstname"] for item in response.data))
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+#
+# Unit tests for the `drf_haystack.utils` classes.
+#
+
+from __future__ import absolute_import, unicode_literals
+
+import time
+
+from django.test import SimpleTestCase
+
+from drf_haystack.utils import DjangoCache, LRUCache
+
+
+class LRUCacheTestCase(SimpleTestCase):
+
+    def test_lru_cache_evicts_least_recently_used(self):
+        cache = LRUCache(maxsize=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        self.assertEqual(cache.get("a"), 1)
+        cache.set("c", 3)
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.get("b"), None)
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(cache.get("c"), 3)
+
+    def test_lru_cache_timeout(self):
+        cache = LRUCache(timeout=60)
+        cache.set("a", 1)
+        cache.set("b", 2, timeout=-1)
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(cache.get("b", "expired"), "expired")
+        self.assertFalse("b" in cache)
+
+    def test_lru_cache_stats(self):
+        cache = LRUCache(maxsize=10)
+        cache.set("a", 1)
+        cache.get("a")
+        cache.get("a")
+        cache.get("b")
+        self.assertEqual(cache.stats(), {"hits": 2, "misses": 1, "ratio": 2.0 / 3, "size": 1, "maxsize": 10})
+        cache.clear()
+        self.assertEqual(cache.stats()["hits"], 0)
+        self.assertEqual(len(cache), 0)
+
+
+class DjangoCacheTestCase(SimpleTestCase):
+
+    def test_django_cache(self):
+        cache = DjangoCache(key_prefix="test-%s" % time.time())
+        self.assertEqual(cache.get(("a", 1)), None)
+        cache.set(("a", 1), "value")
+        self.assertEqual(cache.get(("a", 1)), "value")
+        self.assertEqual(cache.stats(), {"hits": 1, "misses": 1, "ratio": 0.5})
+        cache.delete(("a", 1))
+        self.assertEqual(cache.get(("a", 1)), None)
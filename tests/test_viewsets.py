@@ -5,18 +5,26 @@
 
 from __future__ import absolute_import, unicode_literals
 
+import json
+
+from django.core.exceptions import ImproperlyConfigured
 from django.test import TestCase
 from django.contrib.auth.models import User
 from haystack.query import SearchQuerySet
 from rest_framework import status
+from rest_framework.pagination import PageNumberPagination
 from rest_framework.routers import SimpleRouter
 from rest_framework.serializers import Serializer
 from rest_framework.test import force_authenticate, APIRequestFactory
 
-from drf_haystack.viewsets import HaystackViewSet
+from drf_haystack.pagination import HaystackLimitOffsetPagination, HaystackPageNumberPagination
+from drf_haystack.serializers import HaystackSerializer
+from drf_haystack.utils import LazySearchSlice
+from drf_haystack.viewsets import HaystackExportMixin, HaystackViewSet
 
 from .mockapp.models import MockPerson
 from .mockapp.search_indexes import MockPersonIndex
+from .utils import count_searches
 
 
 factory = APIRequestFactory()
@@ -84,6 +92,164 @@ class HaystackViewSetTestCase(TestCase):
         self.assertEqual(route.mapping, {"get": "more_like_this"})
 
 
+class HaystackStreamingViewSetTestCase(TestCase):
+
+    fixtures = ["mockperson"]
+
+    def setUp(self):
+        MockPersonIndex().reindex()
+
+        class Serializer1(HaystackSerializer):
+
+            class Meta:
+                index_classes = [MockPersonIndex]
+                fields = ["firstname", "lastname", "full_name"]
+
+        class Pagination(PageNumberPagination):
+            page_size = 5
+
+        class ViewSet1(HaystackViewSet):
+            index_models = [MockPerson]
+            serializer_class = Serializer1
+            pagination_class = None
+
+        class ViewSet2(ViewSet1):
+            streaming_list = True
+            streaming_chunk_size = 3
+
+        class ViewSet3(ViewSet1):
+            pagination_class = Pagination
+
+        class ViewSet4(ViewSet2):
+            pagination_class = Pagination
+
+        self.view1 = ViewSet1
+        self.view2 = ViewSet2
+        self.view3 = ViewSet3
+        self.view4 = ViewSet4
+
+    def tearDown(self):
+        MockPersonIndex().clear()
+
+    def get_data(self, view, data=None):
+        request = factory.get(path="/", data=data or {})
+        response = view.as_view(actions={"get": "list"})(request)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        if getattr(response, "streaming", False):
+            return json.loads(b"".join(response.streaming_content).decode())
+        response.render()
+        return json.loads(response.content.decode())
+
+    def test_viewset_streaming_list(self):
+        data = self.get_data(self.view1)
+        streamed_data = self.get_data(self.view2)
+        self.assertTrue(len(data) > self.view2.streaming_chunk_size)
+        key = lambda result: json.dumps(result, sort_keys=True)
+        self.assertEqual(sorted(data, key=key), sorted(streamed_data, key=key))
+
+    def test_viewset_streaming_list_paginated(self):
+        for params in ({}, {"page": 2}, {"firstname": "john"}):
+            data = self.get_data(self.view3, params)
+            streamed_data = self.get_data(self.view4, params)
+            self.assertEqual(data["count"], streamed_data["count"])
+            self.assertEqual(data["next"], streamed_data["next"])
+            self.assertEqual(data["previous"], streamed_data["previous"])
+            self.assertEqual(len(data["results"]), len(streamed_data["results"]))
+
+    def test_viewset_streaming_list_paginated_in_chunks(self):
+        class PageNumberPagination(HaystackPageNumberPagination):
+            page_size = 5
+
+        for pagination_class, params in ((PageNumberPagination, {"page": 2}),
+                                         (HaystackLimitOffsetPagination, {"limit": 5, "offset": 5})):
+            self.view3.pagination_class = self.view4.pagination_class = pagination_class
+            data = self.get_data(self.view3, params)
+
+            with count_searches() as calls:
+                streamed_data = self.get_data(self.view4, params)
+            self.assertEqual(data["count"], streamed_data["count"])
+            self.assertEqual(data["next"], streamed_data["next"])
+            self.assertEqual(len(streamed_data["results"]), 5)
+
+            # The page is fetched one chunk at a time, after counting the results.
+            sizes = [kwargs["end_offset"] - kwargs["start_offset"] for kwargs in calls if kwargs.get("end_offset")]
+            self.assertEqual(sizes[-2:], [3, 2])
+            self.assertTrue(max(sizes) <= self.view4.streaming_chunk_size)
+
+    def test_viewset_streaming_list_chunks(self):
+        queryset = SearchQuerySet().models(MockPerson)
+        results = LazySearchSlice(queryset, chunk_size=3)[2:9]
+        self.assertEqual(len(results), 7)
+        self.assertEqual([len(chunk) for chunk in results.chunks()], [3, 3, 1])
+        self.assertEqual(len(list(results[5:])), 2)
+
+
+class HaystackExportViewSetTestCase(TestCase):
+
+    fixtures = ["mockperson"]
+
+    def setUp(self):
+        MockPersonIndex().reindex()
+
+        class Serializer1(HaystackSerializer):
+
+            class Meta:
+                index_classes = [MockPersonIndex]
+                fields = ["firstname", "lastname"]
+
+        class ViewSet1(HaystackExportMixin, HaystackViewSet):
+            index_models = [MockPerson]
+            serializer_class = Serializer1
+            export_batch_size = 4
+            export_uid_field = "django_id"
+
+        self.view1 = ViewSet1
+
+    def tearDown(self):
+        MockPersonIndex().clear()
+
+    def export(self, view, data=None):
+        request = factory.get(path="/", data=data or {})
+        response = view.as_view(actions={"get": "export"})(request)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        return [json.loads(line) for line in lines]
+
+    def test_viewset_export(self):
+        count = SearchQuerySet().models(MockPerson).count()
+        rows = self.export(self.view1)
+        self.assertTrue(count > self.view1.export_batch_size)
+        self.assertEqual(len(rows), count)
+        self.assertEqual(
+            sorted((row["firstname"], row["lastname"]) for row in rows),
+            sorted((result.firstname, result.lastname) for result in SearchQuerySet().models(MockPerson))
+        )
+
+    def test_viewset_export_filtered(self):
+        rows = self.export(self.view1, {"firstname": "john"})
+        self.assertTrue(len(rows) > 0)
+        self.assertTrue(all(row["firstname"] == "John" for row in rows))
+
+    def test_viewset_export_max_rows(self):
+        setattr(self.view1, "export_max_rows", 6)
+        self.assertEqual(len(self.export(self.view1)), 6)
+
+    def test_viewset_export_opt_in(self):
+        router = SimpleRouter()
+        router.register("search", HaystackViewSet, base_name="search")
+        router.register("export", self.view1, base_name="export")
+        names = [url.name for url in router.urls]
+        self.assertNotIn("search-export", names)
+        self.assertIn("export-export", names)
+
+    def test_viewset_export_uid_field(self):
+        request = factory.get(path="/")
+        for uid_field in (None, "id", "firstname"):
+            setattr(self.view1, "export_uid_field", uid_field)
+            self.assertRaises(ImproperlyConfigured, self.view1.as_view(actions={"get": "export"}), request)
+
+
 class HaystackViewSetPermissionsTestCase(TestCase):
 
     fixtures = ["mockperson"]
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+#
+# Helpers shared by the test modules.
+#
+
+from __future__ import absolute_import, unicode_literals
+
+import time
+from contextlib import contextmanager
+
+import mock
+from haystack import connections
+
+
+@contextmanager
+def count_searches(using="default", delay=None):
+    """
+    Records the keyword arguments of every search made through the search
+    backend of `using`, and yields the list of recorded searches. Every
+    search is slowed down by `delay` seconds, if given.
+    """
+    backend_class = type(connections[using].get_backend())
+    search = backend_class.search
+    calls = []
+
+    def counting_search(backend, *args, **kwargs):
+        calls.append(kwargs)
+        if delay:
+            time.sleep(delay)
+        return search(backend, *args, **kwargs)
+
+    with mock.patch.object(backend_class, "search", counting_search):
+        yield calls